@@ -0,0 +1,272 @@
+"""
+Offline end-to-end benchmark of update handling: the real dispatcher from `main.py` (handlers, middlewares
+and services) is fed synthetic updates, with TMDB, the Telegram Bot API and Redis replaced by local stand-ins
+(see `benchmarks.fakes`). Reports p50/p95/p99 latency and throughput of every kind of update.
+
+Users first go through a warm-up (start, a search, some favorites), then every scenario is run on its own.
+The settings in `config.py` are used as is, except for the tokens and the Redis address, so no secrets are needed.
+
+Run from the repository root:
+
+    python -m benchmarks.end_to_end [--users 200] [--requests 1000] [--concurrency 50] [--tmdb-latency 0.05]
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import time
+from typing import Callable
+
+from aiogram.types import Update
+
+import config
+from benchmarks.fakes import OfflineBot
+
+
+_update_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "language_code": "uk"}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    """
+    An update with a private text message of the user
+    """
+
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "text": text,
+        },
+    }
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    """
+    An update with the user pressing an inline button with the callback data
+    """
+
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "-",
+            },
+        },
+    }
+
+
+def percentile(sorted_values: list[float], share: float) -> float:
+    """
+    The value below which the share of sorted values falls (nearest-rank method)
+    """
+
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(math.ceil(share * len(sorted_values)) - 1, 0)]
+
+
+class Result:
+    """
+    Latencies (in seconds) and errors of the updates of one scenario, and its wall time
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.errors: dict[str, int] = {}
+        self.wall_time = 0.0
+
+    def add_error(self, error: Exception):
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def row(self) -> str:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return (
+            f"{self.name:<20}{count:>8}{sum(self.errors.values()):>8}"
+            + "".join(
+                f"{percentile(latencies, share) * 1000:>9.1f}" for share in (0.5, 0.95, 0.99)
+            )
+            + f"{count / self.wall_time if self.wall_time else 0:>12.1f}"
+        )
+
+    @staticmethod
+    def header() -> str:
+        return (
+            f"{'scenario':<20}{'updates':>8}{'errors':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'updates/s':>12}"
+        )
+
+
+async def feed(offline: OfflineBot, update: dict, result: Result):
+    """
+    Feed the update to the dispatcher, recording its latency (or error) in the result
+    """
+
+    update = Update.model_validate(update, context={"bot": offline.bot})
+
+    start = time.perf_counter()
+    try:
+        await offline.dp.feed_update(offline.bot, update)
+    except Exception as e:
+        result.add_error(e)
+    else:
+        result.latencies.append(time.perf_counter() - start)
+
+
+async def run_scenario(
+    offline: OfflineBot,
+    name: str,
+    make_update: Callable[[int, int], dict | None],
+    users: list[int],
+    requests: int,
+    concurrency: int,
+) -> Result:
+    """
+    Feed `requests` updates made by `make_update(user_id, i)`, `concurrency` at a time, to users in turn
+
+    Returns
+    -------
+    Result
+        The latencies and errors of the updates.
+    """
+
+    result = Result(name)
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def run(i: int):
+        async with limiter:
+            update = make_update(users[i % len(users)], i)
+            if update is not None:
+                await feed(offline, update, result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in range(requests)))
+    result.wall_time = time.perf_counter() - start
+
+    return result
+
+
+async def warm_up(offline: OfflineBot, users: list[int], favorites: int, concurrency: int):
+    """
+    Bring every user to a state all scenarios can run in: started, with a search done and some favorites
+    """
+
+    tmdb = offline.tmdb
+    steps = [
+        lambda user_id, i: message_update(user_id, "/start"),
+        lambda user_id, i: message_update(user_id, f"/search movie {user_id}"),
+    ] + [
+        lambda user_id, i, n=n: callback_update(
+            user_id, f"favorites_add:{tmdb.movie_ids[(user_id + n) % len(tmdb.movie_ids)]}"
+        )
+        for n in range(favorites)
+    ]
+
+    for step in steps:
+        result = await run_scenario(offline, "warm-up", step, users, len(users), concurrency)
+        if result.errors:
+            logging.warning("Warm-up errors: %s", result.errors)
+
+
+def scenarios(offline: OfflineBot, queries: int, favorites: int) -> dict[str, Callable]:
+    """
+    The update makers of the scenarios, by name: commands and every kind of callback
+    """
+
+    tmdb, bot_api = offline.tmdb, offline.bot_api
+    movie_ids = tmdb.movie_ids
+
+    def others(user_id: int, i: int) -> dict | None:
+        # the "Show more results" button of the last search of the user
+        data = bot_api.last_callback(user_id, "others")
+        return callback_update(user_id, data) if data else None
+
+    return {
+        # a limited set of queries, so popular searches hit the caches like in production
+        "search": lambda user_id, i: message_update(user_id, f"/search movie {i % queries}"),
+        "trending": lambda user_id, i: message_update(user_id, "/trending"),
+        "favorites": lambda user_id, i: message_update(user_id, "/favorites"),
+        "expand_trending": lambda user_id, i: callback_update(
+            user_id, f"expand_trending:{tmdb.trending_ids[i % 7]}"
+        ),
+        "expand_favorites": lambda user_id, i: callback_update(
+            user_id, f"expand_favorites:{movie_ids[(user_id + i % favorites) % len(movie_ids)]}"
+        ),
+        "favorites_page": lambda user_id, i: callback_update(user_id, f"favorites_page:{i % 2}"),
+        "others": others,
+        "favorites_add": lambda user_id, i: callback_update(
+            user_id, f"favorites_add:{movie_ids[(user_id * 7 + i) % len(movie_ids)]}"
+        ),
+        # removes the movies added by the previous scenario
+        "favorites_remove": lambda user_id, i: callback_update(
+            user_id, f"favorites_remove:{movie_ids[(user_id * 7 + i) % len(movie_ids)]}"
+        ),
+        # the last one, as it clears the favorites
+        "start": lambda user_id, i: message_update(user_id, "/start"),
+    }
+
+
+async def benchmark(args: argparse.Namespace):
+    offline = OfflineBot.from_arguments(args)
+    await offline.start()
+
+    try:
+        users = list(range(100000, 100000 + args.users))
+        # more than a page, so the second page exists
+        favorites = config.FAVORITES_PAGE_SIZE + 2
+        await warm_up(offline, users, favorites, args.concurrency)
+
+        print(Result.header())
+        results = []
+        for name, make_update in scenarios(offline, args.queries, favorites).items():
+            result = await run_scenario(
+                offline, name, make_update, users, args.requests, args.concurrency
+            )
+            results.append(result)
+            print(result.row())
+
+        errors = {
+            f"{result.name}: {error}": count
+            for result in results
+            for error, count in result.errors.items()
+        }
+        if errors:
+            print("\nerrors:", ", ".join(f"{name} x{count}" for name, count in errors.items()))
+        print("\nTMDB requests:", dict(offline.tmdb.requests))
+        print("Bot API requests:", dict(offline.bot_api.requests))
+    finally:
+        await offline.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=200, help="number of synthetic users")
+    parser.add_argument("--requests", type=int, default=1000, help="updates per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="updates handled at once")
+    parser.add_argument("--queries", type=int, default=100, help="distinct search queries")
+    OfflineBot.add_arguments(parser)
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,766 @@
+"""
+Local stand-ins of the services the bot talks to, for offline benchmarks:
+
+- `FakeTMDB`: an HTTP server with canned TMDB payloads, configurable latency, jitter and error rate
+- `FakeBotAPI`: an HTTP server answering Telegram Bot API methods with plausible results
+- `FakeRedis`: an in-memory server speaking the Redis protocol, with the commands (and Lua scripts) the bot uses
+- `OfflineBot`: the real bot setup from `main.py`, pointed at the three of them
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import hashlib
+import json
+import random
+import time
+import zlib
+from collections import Counter
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from modules.middlewares.sending import SendScheduler
+from modules.services.database import (
+    GET_FAVORITES_META,
+    MIGRATE_LEGACY_FAVORITES,
+    FavoritesRedis,
+)
+from modules.types.common import Movie
+
+
+class _FakeServer:
+    """
+    Base class of the fake HTTP servers: serves `self.app` on a free local port
+    """
+
+    def __init__(self):
+        self.app = web.Application()
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1") -> str:
+        """
+        Start serving on a free port. Returns the base URL of the server
+        """
+
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, 0).start()
+
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeTMDB(_FakeServer):
+    """
+    Fake TMDB API serving `/search/movie`, `/trending/movie/week`, `/movie/{id}` and `/movie/{id}/videos`
+    from a generated catalog of movies.
+
+    Every response is delayed by `latency` ± `jitter` seconds, and fails with an HTTP 500 error
+    with a probability of `error_rate`. About one search query in 20 finds nothing.
+    Movies requested by ID are generated on the fly, so recorded production updates can be replayed.
+
+    Methods
+    -------
+    movie(movie_id) -> dict
+        The search result entry of a movie
+    search_results(query) -> list[int]
+        IDs of the movies found by the query
+    """
+
+    def __init__(
+        self,
+        movies: int = 500,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        """
+        Parameters
+        ----------
+        movies : int, optional
+            The number of movies in the catalog. Default is 500.
+        latency : float, optional
+            The mean response time in seconds. Default is 0.05.
+        jitter : float, optional
+            The maximum deviation of the response time from the mean, in seconds. Default is 0.02.
+        error_rate : float, optional
+            The share of requests failing with an HTTP 500 error. Default is 0.
+        seed : int, optional
+            The seed of the latency and errors. Default is 0.
+        """
+
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+        self.catalog: dict[int, dict] = {}
+        for movie_id in range(1000, 1000 + movies):
+            self.movie(movie_id)
+        self.movie_ids = list(self.catalog)
+        # trending movies always have posters
+        self.trending_ids = [
+            movie_id for movie_id in self.movie_ids if self.catalog[movie_id]["poster_path"]
+        ][:20]
+
+        self.requests: Counter[str] = Counter()
+        self.errors = 0
+
+        self.app.router.add_get("/3/search/movie", self.search)
+        self.app.router.add_get("/3/trending/movie/week", self.trending)
+        self.app.router.add_get(r"/3/movie/{movie_id:\d+}", self.details)
+        self.app.router.add_get(r"/3/movie/{movie_id:\d+}/videos", self.videos)
+
+    @property
+    def base_url(self) -> str:
+        """
+        The URL to use in place of `MovieAPI.BASE_URL`
+        """
+
+        return self.url + "/3"
+
+    def movie(self, movie_id: int) -> dict:
+        """
+        The search result entry of a movie, generated from its ID if it's not in the catalog yet
+        """
+
+        movie = self.catalog.get(movie_id)
+        if movie is None:
+            generator = random.Random(movie_id)
+            movie = self.catalog[movie_id] = {
+                "id": movie_id,
+                "title": f"Фільм {movie_id}",
+                "genre_ids": generator.sample(list(Movie.GENRES), generator.randint(1, 3)),
+                "vote_average": round(generator.uniform(4, 9), 3),
+                "release_date": f"{generator.randint(1970, 2024)}-05-17",
+                "overview": "Опис фільму, достатньо довгий, як у справжніх результатах пошуку. " * 3,
+                # a few movies have no poster
+                "poster_path": f"/poster{movie_id}.jpg" if movie_id % 25 else None,
+            }
+        return movie
+
+    def search_results(self, query: str) -> list[int]:
+        """
+        IDs of the movies found by the query: the same ones every time
+        """
+
+        digest = zlib.crc32(query.encode())
+        if digest % 20 == 0:
+            return []
+        start = digest % len(self.movie_ids)
+        return [self.movie_ids[(start + i) % len(self.movie_ids)] for i in range(8)]
+
+    def _videos(self, movie_id: int) -> list[dict]:
+        return [
+            {"iso_639_1": "en", "type": "Teaser", "site": "YouTube", "key": f"teaser{movie_id}"},
+            {"iso_639_1": "en", "type": "Trailer", "site": "YouTube", "key": f"trailer{movie_id}"},
+        ]
+
+    async def _respond(self, endpoint: str, payload) -> web.Response:
+        self.requests[endpoint] += 1
+
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response(
+                {"success": False, "status_code": 11, "status_message": "Internal error."},
+                status=500,
+            )
+        return web.json_response(payload)
+
+    async def search(self, request: web.Request) -> web.Response:
+        results = [self.movie(movie_id) for movie_id in self.search_results(request.query["query"])]
+        return await self._respond(
+            "/search/movie",
+            {"page": 1, "results": results, "total_pages": 1, "total_results": len(results)},
+        )
+
+    async def trending(self, request: web.Request) -> web.Response:
+        results = [self.movie(movie_id) for movie_id in self.trending_ids]
+        return await self._respond("/trending/movie/week", {"page": 1, "results": results})
+
+    async def details(self, request: web.Request) -> web.Response:
+        movie_id = int(request.match_info["movie_id"])
+        movie = self.movie(movie_id)
+
+        details = {key: value for key, value in movie.items() if key != "genre_ids"}
+        details["genres"] = [
+            {"id": genre_id, "name": Movie.GENRES[genre_id]} for genre_id in movie["genre_ids"]
+        ]
+        if "videos" in request.query.get("append_to_response", ""):
+            details["videos"] = {"results": self._videos(movie_id)}
+        return await self._respond("/movie/{id}", details)
+
+    async def videos(self, request: web.Request) -> web.Response:
+        movie_id = int(request.match_info["movie_id"])
+        return await self._respond(
+            "/movie/{id}/videos", {"id": movie_id, "results": self._videos(movie_id)}
+        )
+
+
+class FakeBotAPI(_FakeServer):
+    """
+    Fake Telegram Bot API: answers every method of any bot with a plausible result after `latency` seconds.
+
+    Sent messages are echoed back (photos get file IDs), and the callback data of the inline buttons
+    sent to every chat is remembered, so benchmarks can press them (see `last_callback`).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Parameters
+        ----------
+        latency : float, optional
+            The response time in seconds. Default is 0.
+        """
+
+        super().__init__()
+        self.latency = latency
+
+        self.requests: Counter[str] = Counter()
+        self._message_ids = 0
+        self._callbacks: dict[int, dict[str, str]] = {}
+
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+
+    def last_callback(self, chat_id: int, prefix: str) -> str | None:
+        """
+        The callback data starting with `prefix` of the button sent to the chat last, if any
+        """
+
+        return self._callbacks.get(chat_id, {}).get(prefix)
+
+    def _remember_buttons(self, chat_id: int, reply_markup: str | None):
+        if not reply_markup:
+            return
+
+        buttons = self._callbacks.setdefault(chat_id, {})
+        for row in json.loads(reply_markup).get("inline_keyboard", []):
+            for button in row:
+                data = button.get("callback_data")
+                if data:
+                    buttons[data.split(":")[0]] = data
+
+    def _message(self, chat_id: int, photo: bool = False, **fields) -> dict:
+        self._message_ids += 1
+        message = {
+            "message_id": self._message_ids,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            **{key: value for key, value in fields.items() if value is not None},
+        }
+        if photo:
+            message["photo"] = [
+                {
+                    "file_id": f"photo{self._message_ids}-{size}",
+                    "file_unique_id": f"unique{self._message_ids}-{size}",
+                    "width": size,
+                    "height": size,
+                }
+                for size in (90, 320, 800)
+            ]
+        return message
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        self.requests[method] += 1
+        params = await request.post()
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = int(params.get("chat_id", 0))
+        self._remember_buttons(chat_id, params.get("reply_markup"))
+
+        if method in ("sendmessage", "editmessagetext", "editmessagereplymarkup"):
+            result = self._message(chat_id, text=params.get("text"))
+        elif method in ("sendphoto", "editmessagecaption"):
+            result = self._message(chat_id, photo=True, caption=params.get("caption"))
+        elif method == "sendmediagroup":
+            result = [self._message(chat_id, photo=True) for _ in json.loads(params["media"])]
+        elif method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "FilmBot", "username": "film_bot"}
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+
+class _Status(str):
+    """A simple string reply of the Redis protocol (not a bulk string)"""
+
+
+class _Error(str):
+    """An error reply of the Redis protocol"""
+
+
+class _WrongType(Exception):
+    """Raised on a command against a key holding the wrong kind of value"""
+
+
+_OK = _Status("OK")
+_QUEUED = _Status("QUEUED")
+
+
+def _encode(value, resp3: bool = False) -> bytes:
+    """
+    Encode a reply in the Redis protocol: RESP2, or RESP3 (which differs in nulls and maps) if `resp3`
+    """
+
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, _Status):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, _Error):
+        return b"-" + value.encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        # binary values were decoded with "surrogateescape", so they are sent back unchanged
+        data = value.encode(errors="surrogateescape")
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item, resp3) for item in value)
+    if isinstance(value, dict):
+        if not resp3:
+            value = [item for pair in value.items() for item in pair]
+            return _encode(value)
+        return b"%%%d\r\n" % len(value) + b"".join(
+            _encode(key, resp3) + _encode(item, resp3) for key, item in value.items()
+        )
+    raise TypeError(f"Cannot encode {value!r}")
+
+
+def _format_score(score: float) -> str:
+    return str(int(score)) if score == int(score) else repr(score)
+
+
+class FakeRedis:
+    """
+    In-memory server speaking the Redis protocol, so the real (async) client is used as is.
+
+    Supports the commands used by the bot and aiogram's `RedisStorage`: strings (with expiration),
+    sorted sets, hashes, SCAN, MULTI/EXEC and the bot's Lua scripts, which are emulated in Python.
+    Everything runs in one event loop, so commands are atomic.
+    """
+
+    def __init__(self):
+        # key -> (type, value): "string" -> str, "zset" -> {member: score}, "hash" -> {field: value}
+        self._data: dict[str, tuple[str, object]] = {}
+        self._expires: dict[str, float] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self.host = ""
+        self.port = 0
+
+        self.commands: Counter[str] = Counter()
+
+        self._scripts = {
+            hashlib.sha1(MIGRATE_LEGACY_FAVORITES.encode()).hexdigest(): self._migrate_legacy_favorites,
+            hashlib.sha1(GET_FAVORITES_META.encode()).hexdigest(): self._get_favorites_meta,
+        }
+
+    async def start(self, host: str = "127.0.0.1") -> tuple[str, int]:
+        """
+        Start serving on a free port. Returns the host and the port
+        """
+
+        self._server = await asyncio.start_server(self._serve, host, 0)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        transaction: list[list[str]] | None = None
+        resp3 = False
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                if not command:
+                    continue
+
+                name = command[0].upper()
+                if name == "MULTI":
+                    transaction, reply = [], _OK
+                elif name == "EXEC":
+                    reply = [self._execute(queued) for queued in transaction or []]
+                    transaction = None
+                elif name == "DISCARD":
+                    transaction, reply = None, _OK
+                elif transaction is not None:
+                    transaction.append(command)
+                    reply = _QUEUED
+                else:
+                    reply = self._execute(command)
+                    if name == "HELLO" and isinstance(reply, dict):
+                        resp3 = reply["proto"] == 3
+
+                writer.write(_encode(reply, resp3))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> list[str] | None:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # inline command
+            return line.decode().split()
+
+        command = []
+        for _ in range(int(line[1:])):
+            length = int((await reader.readline())[1:])
+            command.append((await reader.readexactly(length + 2))[:-2].decode(errors="surrogateescape"))
+        return command
+
+    def _execute(self, command: list[str]):
+        name, *args = command
+        self.commands[name.upper()] += 1
+
+        handler = getattr(self, "_cmd_" + name.lower(), None)
+        if handler is None:
+            return _Error(f"ERR unknown command '{name}'")
+        try:
+            return handler(*args)
+        except _WrongType:
+            return _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        except (TypeError, ValueError, IndexError) as e:
+            return _Error(f"ERR {e}")
+
+    # storage
+
+    def _get(self, key: str, kind: str, create: bool = False):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._delete(key)
+
+        entry = self._data.get(key)
+        if entry is None:
+            if not create:
+                return None
+            entry = self._data[key] = (kind, "" if kind == "string" else {})
+        if entry[0] != kind:
+            raise _WrongType
+        return entry[1]
+
+    def _delete(self, key: str) -> bool:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _exists(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._delete(key)
+        return key in self._data
+
+    # connection
+
+    def _cmd_ping(self, *args):
+        return _Status("PONG") if not args else args[0]
+
+    def _cmd_hello(self, protocol="2", *args):
+        return {"server": "redis", "version": "7.2.0", "proto": int(protocol), "mode": "standalone"}
+
+    def _cmd_client(self, *args):
+        return _OK
+
+    def _cmd_auth(self, *args):
+        return _OK
+
+    def _cmd_select(self, db):
+        return _OK
+
+    # keys
+
+    def _cmd_del(self, *keys):
+        return sum(self._exists(key) and self._delete(key) for key in keys)
+
+    def _cmd_exists(self, *keys):
+        return sum(self._exists(key) for key in keys)
+
+    def _cmd_expire(self, key, seconds):
+        if not self._exists(key):
+            return 0
+        self._expires[key] = time.time() + int(seconds)
+        return 1
+
+    def _cmd_scan(self, cursor, *options):
+        options = dict(zip(map(str.upper, options[::2]), options[1::2]))
+        pattern, kind = options.get("MATCH", "*"), options.get("TYPE", "").lower()
+
+        keys = [
+            key
+            for key in list(self._data)
+            if self._exists(key)
+            and fnmatch.fnmatchcase(key, pattern)
+            and (not kind or self._data[key][0] == kind)
+        ]
+        return ["0", keys]
+
+    # strings
+
+    def _cmd_get(self, key):
+        return self._get(key, "string")
+
+    def _cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        exists = self._exists(key)
+        if "NX" in options and exists or "XX" in options and not exists:
+            return None
+
+        self._delete(key)
+        self._data[key] = ("string", value)
+        for unit, scale in (("EX", 1), ("PX", 0.001)):
+            if unit in options:
+                self._expires[key] = time.time() + int(options[options.index(unit) + 1]) * scale
+        return _OK
+
+    # sorted sets
+
+    def _cmd_zadd(self, key, *args):
+        flags = set()
+        while args and args[0].upper() in ("NX", "XX", "GT", "LT", "CH"):
+            flags.add(args[0].upper())
+            args = args[1:]
+
+        zset = self._get(key, "zset", create=True)
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            if member in zset:
+                if "NX" not in flags:
+                    zset[member] = float(score)
+            elif "XX" not in flags:
+                zset[member] = float(score)
+                added += 1
+        return added
+
+    def _cmd_zrange(self, key, start, stop):
+        zset = self._get(key, "zset") or {}
+        members = sorted(zset, key=lambda member: (zset[member], member))
+
+        start, stop = int(start), int(stop)
+        if start < 0:
+            start += len(members)
+        if stop < 0:
+            stop += len(members)
+        return members[max(start, 0) : stop + 1]
+
+    def _cmd_zscore(self, key, member):
+        score = (self._get(key, "zset") or {}).get(member)
+        return None if score is None else _format_score(score)
+
+    def _cmd_zcard(self, key):
+        return len(self._get(key, "zset") or {})
+
+    def _cmd_zrem(self, key, *members):
+        zset = self._get(key, "zset") or {}
+        removed = sum(zset.pop(member, None) is not None for member in members)
+        if not zset:
+            self._delete(key)
+        return removed
+
+    # hashes
+
+    def _cmd_hset(self, key, *args):
+        hash_ = self._get(key, "hash", create=True)
+        added = 0
+        for field, value in zip(args[::2], args[1::2]):
+            added += field not in hash_
+            hash_[field] = value
+        return added
+
+    def _cmd_hget(self, key, field):
+        return (self._get(key, "hash") or {}).get(field)
+
+    def _cmd_hmget(self, key, *fields):
+        hash_ = self._get(key, "hash") or {}
+        return [hash_.get(field) for field in fields]
+
+    def _cmd_hdel(self, key, *fields):
+        hash_ = self._get(key, "hash") or {}
+        removed = sum(hash_.pop(field, None) is not None for field in fields)
+        if not hash_:
+            self._delete(key)
+        return removed
+
+    # scripts
+
+    def _cmd_script(self, subcommand, *args):
+        if subcommand.upper() == "LOAD":
+            return hashlib.sha1(args[0].encode()).hexdigest()
+        if subcommand.upper() == "EXISTS":
+            return [int(sha in self._scripts) for sha in args]
+        return _OK
+
+    def _cmd_eval(self, script, numkeys, *args):
+        return self._cmd_evalsha(hashlib.sha1(script.encode()).hexdigest(), numkeys, *args)
+
+    def _cmd_evalsha(self, sha, numkeys, *args):
+        script = self._scripts.get(sha)
+        if script is None:
+            return _Error("NOSCRIPT No matching script. Please use EVAL.")
+        numkeys = int(numkeys)
+        return script(list(args[:numkeys]), list(args[numkeys:]))
+
+    def _migrate_legacy_favorites(self, keys: list[str], args: list[str]):
+        raw = self._get(keys[0], "string")
+        if raw is None:
+            return 0
+        try:
+            movie_ids = json.loads(raw)
+        except ValueError:
+            return 0
+        if not isinstance(movie_ids, list):
+            return 0
+
+        for i, movie_id in enumerate(movie_ids, start=1):
+            self._cmd_zadd(keys[1], "NX", str(i), str(movie_id))
+        self._delete(keys[0])
+        return len(movie_ids)
+
+    def _get_favorites_meta(self, keys: list[str], args: list[str]):
+        total = self._cmd_zcard(keys[0])
+        movie_ids = self._cmd_zrange(keys[0], *args)
+        if not movie_ids:
+            return [total]
+        return [total, movie_ids, self._cmd_hmget(keys[1], *movie_ids)]
+
+
+class OfflineBot:
+    """
+    The real bot setup from `main.py` (bot, dispatcher with all the handlers, middlewares and services),
+    with TMDB, the Telegram Bot API and Redis replaced by the local stand-ins.
+
+    Methods
+    -------
+    add_arguments(parser)
+        Add the command line options of the stand-ins to the parser
+    from_arguments(args) -> OfflineBot
+        Create the bot with the stand-ins configured by the command line options
+    start()
+        Start the stand-ins and set up the bot
+    close()
+        Stop everything
+    """
+
+    # any token of the valid format: the fake Bot API accepts all of them
+    TOKEN = "123456:offline-benchmark"
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser):
+        """
+        Add the command line options of the stand-ins to the parser (see `from_arguments`)
+        """
+
+        parser.add_argument("--movies", type=int, default=500, help="movies in the fake TMDB catalog")
+        parser.add_argument("--tmdb-latency", type=float, default=0.05, help="TMDB response time, s")
+        parser.add_argument("--tmdb-jitter", type=float, default=0.02, help="TMDB response time deviation, s")
+        parser.add_argument("--tmdb-error-rate", type=float, default=0.0, help="share of failing TMDB requests")
+        parser.add_argument("--bot-latency", type=float, default=0.0, help="Bot API response time, s")
+        parser.add_argument(
+            "--shaping", action="store_true", help="apply the outbound flood limits from config.py"
+        )
+
+    @classmethod
+    def from_arguments(cls, args: argparse.Namespace) -> "OfflineBot":
+        """
+        Create the bot with the stand-ins configured by the command line options (see `add_arguments`)
+        """
+
+        return cls(
+            FakeTMDB(
+                movies=args.movies,
+                latency=args.tmdb_latency,
+                jitter=args.tmdb_jitter,
+                error_rate=args.tmdb_error_rate,
+            ),
+            FakeBotAPI(latency=args.bot_latency),
+            FakeRedis(),
+            shaping=args.shaping,
+        )
+
+    def __init__(self, tmdb: FakeTMDB, bot_api: FakeBotAPI, redis: FakeRedis, shaping: bool = False):
+        """
+        Parameters
+        ----------
+        tmdb : FakeTMDB
+            The fake TMDB API.
+        bot_api : FakeBotAPI
+            The fake Telegram Bot API.
+        redis : FakeRedis
+            The in-memory Redis.
+        shaping : bool, optional
+            If True, outbound messages go through the `SendScheduler` flood limits like in production.
+            Off by default, so the benchmark measures the bot rather than the configured limits. Default is False.
+        """
+
+        self.tmdb = tmdb
+        self.bot_api = bot_api
+        self.redis = redis
+        self.shaping = shaping
+
+        self.bot: Bot | None = None
+        self.dp: Dispatcher | None = None
+        self.db: FavoritesRedis | None = None
+        self._trending_refresher: asyncio.Task | None = None
+
+    async def start(self):
+        # imported here, so importing the stand-ins does not require a filled in config
+        import config
+        import main
+
+        await self.tmdb.start()
+        await self.bot_api.start()
+        host, port = await self.redis.start()
+
+        config.BOT_TOKEN = self.TOKEN
+        config.REDIS_HOST, config.REDIS_PORT, config.REDIS_PASSWORD = host, port, None
+
+        self.bot = main.create_bot()
+        self.bot.session.api = TelegramAPIServer.from_base(self.bot_api.url)
+        if not self.shaping:
+            for middleware in list(self.bot.session.middleware):
+                if isinstance(middleware, SendScheduler):
+                    self.bot.session.middleware.unregister(middleware)
+
+        self.db = main.create_db()
+        self.dp = main.create_dispatcher(self.db)
+        self.dp["movie_api"].BASE_URL = self.tmdb.base_url
+
+        self._trending_refresher = asyncio.create_task(self.dp["trending_service"].run())
+
+    async def close(self):
+        if self._trending_refresher is not None:
+            self._trending_refresher.cancel()
+        if self.dp is not None:
+            await self.dp["movie_api"].close()
+        if self.db is not None:
+            await self.db.close()
+        if self.bot is not None:
+            await self.bot.session.close()
+
+        await self.redis.close()
+        await self.bot_api.close()
+        await self.tmdb.close()
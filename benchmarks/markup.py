@@ -0,0 +1,52 @@
+"""
+Microbenchmark of inline and reply markups: building a fresh markup for every message
+against getting the shared instance from `cached()`.
+
+`SearchResultInlineMarkup` is not measured: it holds the token of the search results, unique to every search,
+so it is always built fresh.
+
+Run from the repository root:
+
+    python -m benchmarks.markup
+"""
+
+import timeit
+
+from modules.types.markup import ClearConfirmMarkup, InfoInlineMarkup, MainMenuMarkup
+
+
+NUMBER = 100_000
+
+# a realistic working set: popular movies are shown over and over
+MOVIE_IDS = list(range(1000))
+
+
+def main():
+    cases = [
+        ("MainMenuMarkup", lambda i: MainMenuMarkup(), lambda i: MainMenuMarkup.cached()),
+        (
+            "ClearConfirmMarkup",
+            lambda i: ClearConfirmMarkup(),
+            lambda i: ClearConfirmMarkup.cached(),
+        ),
+        (
+            "InfoInlineMarkup",
+            lambda i: InfoInlineMarkup(MOVIE_IDS[i % len(MOVIE_IDS)], "add"),
+            lambda i: InfoInlineMarkup.cached(MOVIE_IDS[i % len(MOVIE_IDS)], "add"),
+        ),
+    ]
+
+    print(f"{'per message, us':<28}{'fresh':>10}{'cached':>10}{'speedup':>10}")
+    for name, fresh, cached in cases:
+        fresh_time = timeit.timeit(lambda: [fresh(i) for i in range(NUMBER)], number=1)
+        # the first use of every movie (a cache miss) is counted too
+        cached_time = timeit.timeit(lambda: [cached(i) for i in range(NUMBER)], number=1)
+
+        print(
+            f"{name:<28}{fresh_time / NUMBER * 1e6:>10.2f}{cached_time / NUMBER * 1e6:>10.2f}"
+            f"{fresh_time / cached_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
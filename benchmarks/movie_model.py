@@ -0,0 +1,169 @@
+"""
+Benchmark of the `Movie` model: memory per object and (de)serialization throughput,
+against the previous dict-backed class with JSON serialization. The binary rows use the formats
+of the Redis stores: `to_bytes` for one movie (the shared TMDB cache) and `pack_many` for a list (search results).
+
+Run from the repository root:
+
+    python -m benchmarks.movie_model
+"""
+
+import json
+import timeit
+import tracemalloc
+
+from modules.types.common import Movie
+
+
+class DictMovie:
+    """
+    The previous `Movie` class: a plain object with a `__dict__`, genres built on every construction
+    """
+
+    def __init__(self, movie_id, title, genres, rating, year, overview, poster_url, trailer_url=""):
+        self.movie_id = movie_id
+        self.title = title
+        self.genres = genres
+        self.rating = rating
+        self.year = year
+        self.overview = overview
+        self.poster_path = poster_url
+        self.trailer_url = trailer_url
+
+    @classmethod
+    def from_api(cls, data: dict):
+        genre_names = [Movie.GENRES[genre_id] for genre_id in data["genre_ids"]]
+        genres = ", ".join(genre_names).capitalize()
+        poster_url = f"https://image.tmdb.org/t/p/w500/{data['poster_path']}"
+
+        return cls(
+            data["id"],
+            data["title"],
+            genres,
+            round(data["vote_average"], 1),
+            data["release_date"][:4],
+            data["overview"],
+            poster_url,
+            data["trailer_url"],
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "movie_id": self.movie_id,
+            "title": self.title,
+            "genres": self.genres,
+            "rating": self.rating,
+            "year": self.year,
+            "overview": self.overview,
+            "poster_url": self.poster_path,
+            "trailer_url": self.trailer_url,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+
+COUNT = 10000
+
+API_DATA = [
+    {
+        "id": 100000 + i,
+        "title": f"Фільм номер {i}",
+        "genre_ids": [28, 12, 878] if i % 2 else [18, 10749],
+        "vote_average": 7.345,
+        "release_date": "2024-05-17",
+        "overview": "Опис фільму, достатньо довгий, як у справжніх результатах пошуку TMDB. " * 4,
+        "poster_path": "/abcdefghijklmnopqrstuvwxyz.jpg",
+        "trailer_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    }
+    for i in range(COUNT)
+]
+
+
+def memory_per_object(cls) -> float:
+    """
+    Bytes allocated per movie built from API data (the shared API data itself is not counted)
+    """
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    movies = [cls.from_api(data) for data in API_DATA]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del movies
+    return allocated / COUNT
+
+
+def throughput(function, number: int = 5) -> float:
+    """
+    Objects per second processed by the function (which handles all COUNT objects at once)
+    """
+
+    return COUNT * number / timeit.timeit(function, number=number)
+
+
+def main():
+    dict_movies = [DictMovie.from_api(data) for data in API_DATA]
+    movies = [Movie.from_api(data) for data in API_DATA]
+
+    dict_blobs = [json.dumps(movie.to_dict()) for movie in dict_movies]
+    blobs = [movie.to_bytes() for movie in movies]
+
+    # lists of 5 movies, like the other results of a search
+    dict_lists = [dict_movies[i : i + 5] for i in range(0, COUNT, 5)]
+    lists = [movies[i : i + 5] for i in range(0, COUNT, 5)]
+    dict_list_blobs = [json.dumps([movie.to_dict() for movie in group]) for group in dict_lists]
+    list_blobs = [Movie.pack_many(group) for group in lists]
+
+    rows = [
+        (
+            "memory per object, bytes",
+            memory_per_object(DictMovie),
+            memory_per_object(Movie),
+        ),
+        (
+            "from_api, objects/s",
+            throughput(lambda: [DictMovie.from_api(data) for data in API_DATA]),
+            throughput(lambda: [Movie.from_api(data) for data in API_DATA]),
+        ),
+        (
+            "serialize, objects/s",
+            throughput(lambda: [json.dumps(movie.to_dict()) for movie in dict_movies]),
+            throughput(lambda: [movie.to_bytes() for movie in movies]),
+        ),
+        (
+            "deserialize, objects/s",
+            throughput(lambda: [DictMovie.from_dict(json.loads(blob)) for blob in dict_blobs]),
+            throughput(lambda: [Movie.from_bytes(blob) for blob in blobs]),
+        ),
+        (
+            "serialize lists, objects/s",
+            throughput(
+                lambda: [json.dumps([movie.to_dict() for movie in group]) for group in dict_lists]
+            ),
+            throughput(lambda: [Movie.pack_many(group) for group in lists]),
+        ),
+        (
+            "deserialize lists, objects/s",
+            throughput(
+                lambda: [[DictMovie.from_dict(data) for data in json.loads(blob)] for blob in dict_list_blobs]
+            ),
+            throughput(lambda: [Movie.unpack_many(blob) for blob in list_blobs]),
+        ),
+        (
+            "serialized size, bytes",
+            sum(len(blob.encode()) for blob in dict_blobs) / COUNT,
+            sum(len(blob) for blob in blobs) / COUNT,
+        ),
+    ]
+
+    print(f"{'':<28}{'dict + JSON':>16}{'named tuple + binary':>22}")
+    for name, old, new in rows:
+        print(f"{name:<28}{old:>16,.0f}{new:>22,.0f}")
+
+
+if __name__ == "__main__":
+    main()
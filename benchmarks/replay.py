@@ -0,0 +1,211 @@
+"""
+Replay of recorded traffic: updates recorded by `UpdateRecorder` (see `modules/middlewares/recording.py`,
+enabled with `RECORD_UPDATES` in `config.py`) are fed to the real dispatcher from `main.py` with the original
+timing, sped up, or as fast as possible, against the local stand-ins (see `benchmarks.fakes`).
+Reports latency percentiles and errors by kind of update.
+
+Updates of one user are handled in order, like in production. Latency is counted from the moment an update
+is due (at its scaled recorded time), so it includes waiting for the user's previous update.
+The "Show more results" tokens in recorded callbacks are replaced with the ones the replayed searches got.
+
+Run from the repository root:
+
+    python -m benchmarks.replay updates.log [--speed 1 | --speed 10 | --speed 0 (as fast as possible)]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from aiogram.types import Update
+
+from benchmarks.end_to_end import Result
+from benchmarks.fakes import FakeBotAPI, OfflineBot
+from modules.middlewares.recording import read_records
+from modules.services.workers import shard_key
+from modules.types.common import templates
+
+
+def update_kind(update: dict, buttons: dict[str, str]) -> str:
+    """
+    The kind of an update the results are grouped by: a command ("/search"), a menu button, text (a search query)
+    or the prefix of the callback data ("favorites_add")
+
+    Parameters
+    ----------
+    update : dict
+        The update.
+    buttons : dict[str, str]
+        The names of the menu buttons by their texts.
+    """
+
+    message = update.get("message")
+    if message is not None:
+        text = message.get("text", "")
+        if text.startswith("/"):
+            return text.split()[0].split("@")[0]
+        return buttons.get(text, "text")
+
+    callback = update.get("callback_query")
+    if callback is not None:
+        return callback.get("data", "").split(":")[0]
+
+    return next((key for key in update if key != "update_id"), "unknown")
+
+
+def rebind(update: dict, bot_api: FakeBotAPI) -> dict:
+    """
+    Replace the search results token in a recorded callback with the one of the last search replayed
+    by the user, as the recorded one only existed in production
+    """
+
+    callback = update.get("callback_query")
+    if callback is None or "data" not in callback:
+        return update
+
+    data = callback["data"]
+    if not data.startswith("others:") and "|search:" not in data:
+        return update
+
+    others = bot_api.last_callback(callback["from"]["id"], "others")
+    if others is None:
+        return update
+
+    token = others.removeprefix("others:")
+    if data.startswith("others:"):
+        data = "others:" + token
+    else:
+        data = data.partition("|search:")[0] + "|search:" + token
+
+    return {**update, "callback_query": {**callback, "data": data}}
+
+
+async def replay(
+    offline: OfflineBot, records: list[tuple[float, dict]], speed: float, concurrency: int
+) -> tuple[dict[str, Result], float]:
+    """
+    Feed the recorded updates to the dispatcher
+
+    Parameters
+    ----------
+    offline : OfflineBot
+        The bot with the stand-ins.
+    records : list[tuple[float, dict]]
+        The recorded updates with the times they were received, in order.
+    speed : float
+        How many times faster than recorded the updates are fed, 0 to feed them as fast as possible.
+    concurrency : int
+        The maximum number of updates handled at once when fed as fast as possible.
+
+    Returns
+    -------
+    tuple[dict[str, Result], float]
+        The results by kind of update, and the seconds the replay took.
+    """
+
+    buttons = {
+        text: name.removeprefix("BUTTON_").lower()
+        for name, text in templates._load().items()
+        if name.startswith("BUTTON_")
+    }
+    results: dict[str, Result] = {}
+    # the last update of every user, so the next one waits for it
+    last_updates: dict[int, asyncio.Task] = {}
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def handle(update: dict, due: float, previous: asyncio.Task | None):
+        kind = update_kind(update, buttons)
+        result = results.setdefault(kind, Result(kind))
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+
+            update = Update.model_validate(rebind(update, offline.bot_api), context={"bot": offline.bot})
+            await offline.dp.feed_update(offline.bot, update)
+        except Exception as e:
+            result.add_error(e)
+        else:
+            result.latencies.append(time.perf_counter() - due)
+        finally:
+            if not speed:
+                limiter.release()
+
+    start = time.perf_counter()
+    first_time = records[0][0] if records else 0
+    for received_at, update in records:
+        if speed:
+            due = start + (received_at - first_time) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await limiter.acquire()
+            due = time.perf_counter()
+
+        key = shard_key(update)
+        last_updates[key] = asyncio.create_task(handle(update, due, last_updates.get(key)))
+
+    await asyncio.gather(*last_updates.values())
+    wall_time = time.perf_counter() - start
+
+    for result in results.values():
+        result.wall_time = wall_time
+    return results, wall_time
+
+
+async def main_async(args: argparse.Namespace):
+    records = sorted(read_records(args.log), key=lambda record: record[0])
+    if not records:
+        print(f"No updates recorded in {args.log}")
+        return
+
+    offline = OfflineBot.from_arguments(args)
+    await offline.start()
+
+    try:
+        results, wall_time = await replay(offline, records, args.speed, args.concurrency)
+    finally:
+        await offline.close()
+
+    recorded_time = records[-1][0] - records[0][0]
+    print(
+        f"Replayed {len(records)} updates recorded over {recorded_time:.1f} s in {wall_time:.1f} s "
+        f"({len(records) / wall_time:.1f} updates/s)\n"
+    )
+    print(Result.header())
+    for result in sorted(results.values(), key=lambda result: -len(result.latencies)):
+        print(result.row())
+
+    errors = [
+        f"{result.name}: {error} x{count}"
+        for result in results.values()
+        for error, count in result.errors.items()
+    ]
+    if errors:
+        print("\nerrors:", ", ".join(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("log", help="the log of recorded updates")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="how many times faster than recorded to replay, 0 for as fast as possible",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=100,
+        help="updates handled at once when replaying as fast as possible",
+    )
+    OfflineBot.add_arguments(parser)
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of message templates: cold-start load time and the cost of getting a template,
+against the previous `MessageTemplates` singleton that parsed the YAML file on first use.
+
+Run from the repository root:
+
+    python -m benchmarks.templates
+"""
+
+import os
+import subprocess
+import sys
+import timeit
+
+from modules.types.common import MessageTemplates, templates
+
+
+YAML_PATH = "modules/messageTemplates.yaml"
+
+
+class YamlMessageTemplates:
+    """
+    The previous `MessageTemplates` class: parses the YAML file on first use,
+    with singleton checks in `__new__` and `__init__` on every `YamlMessageTemplates()` call
+    """
+
+    _instance = None
+    _initialized = False
+
+    def __new__(cls, yaml_path=YAML_PATH):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, yaml_path=YAML_PATH):
+        if not YamlMessageTemplates._initialized:
+            import yaml
+
+            with open(yaml_path, "r", encoding="utf-8") as file:
+                for key, value in yaml.safe_load(file).items():
+                    setattr(self, key, value)
+
+            YamlMessageTemplates._initialized = True
+
+
+# Cold starts are measured in fresh interpreters, including the import of the parser
+COLD_YAML = """
+import yaml
+with open({path!r}, "r", encoding="utf-8") as file:
+    yaml.safe_load(file)
+"""
+
+COLD_COMPILED = """
+from modules.types.common import MessageTemplates
+MessageTemplates()._load()
+"""
+
+
+def cold_start(code: str, runs: int = 10) -> float:
+    """
+    Median seconds a fresh interpreter takes to run the code (after the imports common to both ways)
+    """
+
+    times = []
+    for _ in range(runs):
+        timer = (
+            "import time; start = time.perf_counter()\n"
+            + code
+            + "\nprint(time.perf_counter() - start)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", "import modules.types.common\n" + timer],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        times.append(float(output))
+
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    # make sure the compiled file is up to date, so the cold start measures loading it
+    MessageTemplates()._load()
+
+    yaml_load = cold_start(COLD_YAML.format(path=YAML_PATH))
+    compiled_load = cold_start(COLD_COMPILED)
+
+    number = 1_000_000
+    # warm up both
+    YamlMessageTemplates().BUTTON_HELP, templates.BUTTON_HELP
+    singleton_access = timeit.timeit(lambda: YamlMessageTemplates().BUTTON_HELP, number=number)
+    module_access = timeit.timeit(lambda: templates.BUTTON_HELP, number=number)
+
+    print(f"{'':<34}{'YAML singleton':>16}{'compiled':>16}")
+    print(f"{'cold load, ms':<34}{yaml_load * 1000:>16.2f}{compiled_load * 1000:>16.2f}")
+    print(
+        f"{'template access, ns':<34}"
+        f"{singleton_access / number * 1e9:>16.0f}{module_access / number * 1e9:>16.0f}"
+    )
+    print(f"compiled file: {os.path.abspath(MessageTemplates()._compiled_path())}")
+
+
+if __name__ == "__main__":
+    main()
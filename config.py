@@ -1,11 +1,82 @@
 import os
 
-# Telegram Bot API token. You can acquire one here: https://t.me/BotFather
-BOT_TOKEN =
+# Telegram Bot API token (required to run the bot). You can acquire one here: https://t.me/BotFather
+BOT_TOKEN = ""
+# How to receive updates: "polling" or "webhook" (an embedded HTTP server Telegram sends updates to)
+UPDATES_MODE = "polling"
+# Webhook server interface, port and path. Updates can be tested locally by POSTing their JSON to it
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8080
+WEBHOOK_PATH = "/webhook"
+# Public URL of the webhook to register with Telegram (e.g. "https://example.com/webhook"), leave empty to not register it
+WEBHOOK_URL = ""
+# Secret token Telegram sends with every update, requests without it are rejected. Leave empty to not check
+WEBHOOK_SECRET_TOKEN = ""
+# Maximum number of updates processed at once in webhook mode
+WEBHOOK_CONCURRENCY = 100
+# Number of worker processes handling updates. With more than 1, the main process only receives updates and routes them
+# to the workers by user, so the bot uses several CPU cores while updates of one user are handled in order
+WORKERS = 1
+# Maximum number of updates processed at once by one worker process
+WORKER_CONCURRENCY = 100
 # The Movie Database API access token. You can acquire one here: https://developers.themoviedb.org/3/getting-started/introduction.
-# Beware that this is NOT an API key, but an access token!
-TMDB_ACCESS_TOKEN =
+# Beware that this is NOT an API key, but an access token! Required to run the bot
+TMDB_ACCESS_TOKEN = ""
 # Host, port, and password for the Redis database. You can acquire a free hosted database one here: https://cloud.redis.io/
-REDIS_HOST =
-REDIS_PORT =
-REDIS_PASSWORD =
\ No newline at end of file
+REDIS_HOST = "localhost"
+REDIS_PORT = 6379
+REDIS_PASSWORD = None
+# Redis connection pool size (of each of the two pools: text and binary values) and timeouts in seconds.
+# Idle connections are checked every REDIS_HEALTH_CHECK_INTERVAL seconds
+REDIS_MAX_CONNECTIONS = 50
+REDIS_SOCKET_TIMEOUT = 5
+REDIS_SOCKET_CONNECT_TIMEOUT = 5
+REDIS_HEALTH_CHECK_INTERVAL = 30
+# Convert favorites stored in the legacy format (JSON lists) to sorted sets on the first startup (the completion is
+# recorded in Redis, so later startups skip it)
+REDIS_MIGRATE_LEGACY_FAVORITES = True
+# Seconds after which stored metadata of a favorite movie (title, year, poster) is refreshed from TMDB in background
+FAVORITES_META_MAX_AGE = 30 * 24 * 60 * 60
+# Number of favorite movies shown on one page of the /favorites list
+FAVORITES_PAGE_SIZE = 10
+# TMDB HTTP client tuning: connection pool size (total and per host) and timeouts in seconds
+TMDB_POOL_LIMIT = 20
+TMDB_POOL_LIMIT_PER_HOST = 10
+TMDB_TIMEOUT = 10
+TMDB_KEEPALIVE_TIMEOUT = 30
+# Maximum number of TMDB requests in flight at once (per bot process)
+TMDB_CONCURRENCY = 8
+# Maximum number of TMDB responses kept in the in-memory cache, 0 disables it
+TMDB_CACHE_SIZE = 2048
+# Shared TMDB cache in Redis (used by all bot replicas): whether it's enabled, and soft/hard time to live in seconds.
+# A stale entry (older than the soft TTL) is still served while it's being refreshed in background
+TMDB_SHARED_CACHE = True
+TMDB_SHARED_CACHE_SOFT_TTL = 6 * 60 * 60
+TMDB_SHARED_CACHE_HARD_TTL = 3 * 24 * 60 * 60
+# Where FSM states are kept: "memory" (per process) or "redis" (shared by all bot replicas)
+FSM_STORAGE = "memory"
+# Seconds a user's FSM state is kept after the last change
+FSM_TTL = 24 * 60 * 60
+# Maximum number of users whose FSM state is kept in memory (least recently used are dropped)
+FSM_MEMORY_MAX_SIZE = 10000
+# Seconds search results are kept for the "Show more results" button
+SEARCH_RESULTS_TTL = 60 * 60
+# Outbound messages shaping to stay within Telegram flood limits: messages per second to all chats (split between
+# worker processes) and to one chat, the burst allowed to one chat, and retries of a message after a "retry after" answer
+SEND_GLOBAL_RATE = 30
+SEND_CHAT_RATE = 1
+SEND_CHAT_BURST = 3
+SEND_MAX_RETRIES = 3
+# Serve Prometheus metrics (handler, TMDB and Redis latencies) on http://METRICS_HOST:METRICS_PORT/metrics.
+# Worker processes use the following ports: METRICS_PORT + 0, + 1, ...
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9100
+# Record incoming updates, with user IDs anonymized, to an append-only log for replay (see benchmarks/replay.py).
+# Anonymous IDs are keyed hashes: set RECORD_SALT to keep them the same across restarts,
+# leave it empty to use a random key per run (shared by the worker processes)
+RECORD_UPDATES = False
+RECORD_PATH = "updates.log"
+RECORD_SALT = ""
+# Seconds between background refreshes of the trending movies list
+TRENDING_REFRESH_INTERVAL = 60 * 60
@@ -1,42 +1,269 @@
 import asyncio
+import functools
+import secrets
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums.parse_mode import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.redis import RedisStorage
 
 from modules.services.movieAPI import MovieAPI
-from modules.services.database import FavoritesRedis
+from modules.services.cache import RedisMovieCache
+from modules.services.database import FavoritesRedis, PosterFileIds, SearchResults
+from modules.services.trending import TrendingService
+from modules.services.webhook import WebhookServer
+from modules.services.workers import WorkerPool, UpdateWorker
+from modules.services.storage import TTLMemoryStorage
 
 from modules.handlers.general import setup as setup_general
 from modules.handlers.commands import setup as setup_commands
 from modules.handlers.callbacks import setup as setup_callbacks
 from modules.handlers.fsm import setup as setup_fsm
+from modules.middlewares.favorites import setup as setup_favorites_middleware
+from modules.middlewares.sending import SendScheduler
+from modules.middlewares.metrics import setup as setup_metrics_middleware
+from modules.middlewares.recording import UpdateRecorder, setup as setup_recording
+from modules.services.metrics import MetricsServer
 
 import config
 import logging
 
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
-
+def create_bot() -> Bot:
     bot = Bot(
         token=config.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    movie_api = MovieAPI(config.TMDB_ACCESS_TOKEN)
-    db = FavoritesRedis(
+    bot.session.middleware(
+        SendScheduler(
+            global_rate=config.SEND_GLOBAL_RATE / config.WORKERS,
+            chat_rate=config.SEND_CHAT_RATE,
+            chat_burst=config.SEND_CHAT_BURST,
+            max_retries=config.SEND_MAX_RETRIES,
+        )
+    )
+    return bot
+
+
+async def start_metrics(worker: int = 0) -> MetricsServer | None:
+    """
+    Start serving the metrics, if enabled. Worker processes serve them on consecutive ports
+    """
+
+    if not config.METRICS_ENABLED:
+        return None
+
+    server = MetricsServer(host=config.METRICS_HOST, port=config.METRICS_PORT + worker)
+    await server.start()
+    return server
+
+
+def start_recording(dp: Dispatcher, salt: bytes | None = None) -> UpdateRecorder | None:
+    """
+    Start recording the updates fed to the dispatcher, if enabled. The anonymous IDs are keyed with `salt`,
+    by default with `config.RECORD_SALT` (or a random key if it's empty)
+    """
+
+    if not config.RECORD_UPDATES:
+        return None
+
+    return setup_recording(dp, config.RECORD_PATH, salt or config.RECORD_SALT.encode() or None)
+
+
+def create_db() -> FavoritesRedis:
+    return FavoritesRedis(
         host=config.REDIS_HOST,
         port=config.REDIS_PORT,
         password=config.REDIS_PASSWORD,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=config.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
     )
 
-    dp = Dispatcher(db=db, movie_api=movie_api)
+
+async def migrate_legacy_favorites(db: FavoritesRedis):
+    if config.REDIS_MIGRATE_LEGACY_FAVORITES:
+        migrated = await db.migrate_legacy_favorites()
+        logging.info("Migrated legacy favorites of %d users", migrated)
+
+
+def create_storage(db: FavoritesRedis) -> BaseStorage:
+    if config.FSM_STORAGE == "redis":
+        return RedisStorage(db.r, state_ttl=config.FSM_TTL, data_ttl=config.FSM_TTL)
+    return TTLMemoryStorage(ttl=config.FSM_TTL, max_size=config.FSM_MEMORY_MAX_SIZE)
+
+
+def setup_handlers(dp: Dispatcher):
+    setup_metrics_middleware(dp)
+    setup_favorites_middleware(dp)
     setup_general(dp)
     setup_commands(dp)
     setup_callbacks(dp)
     setup_fsm(dp)
-    
 
-    await dp.start_polling(bot)
+
+def create_dispatcher(db: FavoritesRedis) -> Dispatcher:
+    """
+    Create the dispatcher with all the handlers and the services they use
+    """
+
+    if config.TMDB_SHARED_CACHE:
+        shared_cache = RedisMovieCache(
+            db.raw,
+            soft_ttl=config.TMDB_SHARED_CACHE_SOFT_TTL,
+            hard_ttl=config.TMDB_SHARED_CACHE_HARD_TTL,
+        )
+    else:
+        shared_cache = None
+
+    movie_api = MovieAPI(
+        config.TMDB_ACCESS_TOKEN,
+        pool_limit=config.TMDB_POOL_LIMIT,
+        pool_limit_per_host=config.TMDB_POOL_LIMIT_PER_HOST,
+        timeout=config.TMDB_TIMEOUT,
+        keepalive_timeout=config.TMDB_KEEPALIVE_TIMEOUT,
+        concurrency=config.TMDB_CONCURRENCY,
+        cache_size=config.TMDB_CACHE_SIZE,
+        shared_cache=shared_cache,
+    )
+    posters = PosterFileIds(db.r)
+    search_results = SearchResults(db.raw, ttl=config.SEARCH_RESULTS_TTL)
+    trending_service = TrendingService(
+        movie_api, interval=config.TRENDING_REFRESH_INTERVAL
+    )
+
+    dp = Dispatcher(
+        storage=create_storage(db),
+        db=db,
+        movie_api=movie_api,
+        trending_service=trending_service,
+        posters=posters,
+        search_results=search_results,
+    )
+    setup_handlers(dp)
+
+    return dp
+
+
+def run_worker(queue, worker: int, record_salt: bytes | None = None):
+    """
+    Entry point of a worker process: handles the updates routed to it by the front process.
+    `record_salt` is the key of the anonymous IDs in recorded updates, the same in all workers
+    """
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(worker_main(queue, worker, record_salt))
+    except KeyboardInterrupt:
+        pass
+
+
+async def worker_main(queue, worker: int, record_salt: bytes | None = None):
+    bot = create_bot()
+    db = create_db()
+    dp = create_dispatcher(db)
+    metrics = await start_metrics(worker)
+    recorder = start_recording(dp, record_salt)
+
+    trending_refresher = asyncio.create_task(dp["trending_service"].run())
+
+    try:
+        await UpdateWorker(dp, bot, queue, concurrency=config.WORKER_CONCURRENCY).run()
+    finally:
+        if metrics is not None:
+            await metrics.close()
+        if recorder is not None:
+            recorder.close()
+        trending_refresher.cancel()
+        await dp["movie_api"].close()
+        await db.close()
+        await bot.session.close()
+
+
+async def front_main(bot: Bot):
+    """
+    Receive updates and route them to `config.WORKERS` worker processes
+    """
+
+    db = create_db()
+    try:
+        await migrate_legacy_favorites(db)
+    finally:
+        await db.close()
+
+    # handlers are only registered to know which update types to receive
+    dp = Dispatcher()
+    setup_handlers(dp)
+
+    # one key for all workers, so a user gets the same anonymous ID whichever worker records the update
+    record_salt = config.RECORD_SALT.encode() or secrets.token_bytes(16)
+    pool = WorkerPool(config.WORKERS, functools.partial(run_worker, record_salt=record_salt))
+    pool.start()
+
+    try:
+        if config.UPDATES_MODE == "webhook":
+            webhook = WebhookServer(
+                dp,
+                bot,
+                host=config.WEBHOOK_HOST,
+                port=config.WEBHOOK_PORT,
+                path=config.WEBHOOK_PATH,
+                url=config.WEBHOOK_URL,
+                secret_token=config.WEBHOOK_SECRET_TOKEN,
+                pool=pool,
+            )
+            await webhook.run()
+        else:
+            await bot.delete_webhook()
+            await pool.poll(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await pool.close()
+        await bot.session.close()
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+
+    bot = create_bot()
+
+    if config.WORKERS > 1:
+        await front_main(bot)
+        return
+
+    db = create_db()
+    await migrate_legacy_favorites(db)
+    dp = create_dispatcher(db)
+    metrics = await start_metrics()
+    recorder = start_recording(dp)
+
+    trending_refresher = asyncio.create_task(dp["trending_service"].run())
+
+    try:
+        if config.UPDATES_MODE == "webhook":
+            webhook = WebhookServer(
+                dp,
+                bot,
+                host=config.WEBHOOK_HOST,
+                port=config.WEBHOOK_PORT,
+                path=config.WEBHOOK_PATH,
+                url=config.WEBHOOK_URL,
+                secret_token=config.WEBHOOK_SECRET_TOKEN,
+                concurrency=config.WEBHOOK_CONCURRENCY,
+            )
+            await webhook.run()
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if metrics is not None:
+            await metrics.close()
+        if recorder is not None:
+            recorder.close()
+        trending_refresher.cancel()
+        await dp["movie_api"].close()
+        await db.close()
+        # `start_polling` closes it, but the webhook server doesn't (closing twice is harmless)
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -1,80 +1,99 @@
 from aiogram import Dispatcher, types, F
+from aiogram.exceptions import TelegramBadRequest
 
 from modules.services.movieAPI import MovieAPI
-from modules.services.database import FavoritesRedis
-from modules.types.common import MessageTemplates as template
+from modules.services.database import FavoritesRedis, PosterFileIds, SearchResults
+from modules.middlewares.favorites import FavoritesSnapshot
+from modules.middlewares.sending import bulk_sends
+from modules.types.common import templates
 from modules.types.markup import InfoInlineMarkup, SearchResultInlineMarkup
-from modules.handlers.general import _send_movie
+from modules.handlers.general import _send_movie, _favorites_page, _refresh_movies_meta_in_background
 
 
 async def show_more_results(
     callback: types.CallbackQuery,
     movie_api: MovieAPI,
-    db: FavoritesRedis,
+    favorites: FavoritesSnapshot,
+    posters: PosterFileIds,
+    search_results: SearchResults,
 ):
     """
-    Called on a `show_more_results` callback (when user presses "Show more results" button unser a serach result).
+    Called on a `others:<token>` callback (when user presses "Show more results" button unser a serach result).
 
-    Retureves full search results list from state data and sends them to the user
+    Retrieves the other search results stored by the search (only their trailers are looked up) and sends them to the user
     """
-    other_ids = callback.data.removeprefix("others:").split(",")
-    
-    try:
-        other_results = movie_api.movie_factory(other_ids)
-    except KeyError:
-        await callback.answer(template().GENERAL_ERROR)
+    token = callback.data.removeprefix("others:")
+
+    other_results = await search_results.get(token)
+    if other_results is None:
+        await callback.answer(templates.SEARCH_MORE_EXPIRED, show_alert=True)
         return
-    
-    await callback.message.answer(template().SEARCH_MORE_PENDING + str(len(other_results)))
 
-    for result in other_results:
-        action = (
-            "add"
-            if result.movie_id not in db.get_user_movies(callback.from_user.id)
-            else "remove"
-        )
+    other_results = await movie_api.resolve_trailers(other_results)
+
+    await callback.message.answer(templates.SEARCH_MORE_PENDING + str(len(other_results)))
 
-        markup = InfoInlineMarkup(result.movie_id, favorites_action=action)
+    # the results go out after interactive replies to other users
+    with bulk_sends():
+        for result in other_results:
+            action = (
+                "add"
+                if not await favorites.contains(result.movie_id)
+                else "remove"
+            )
 
-        await _send_movie(callback.message, result, markup)
+            markup = InfoInlineMarkup.cached(result.movie_id, action)
 
-    await callback.answer(template().SEARCH_MORE_DISPLAYED_ALERT + str(len(other_results)))
+            await _send_movie(callback.message, result, markup, posters)
 
+    await callback.answer(templates.SEARCH_MORE_DISPLAYED_ALERT + str(len(other_results)))
 
-async def update_favorites(callback: types.CallbackQuery, db: FavoritesRedis):
+
+async def update_favorites(
+    callback: types.CallbackQuery,
+    movie_api: MovieAPI,
+    db: FavoritesRedis,
+    favorites: FavoritesSnapshot,
+):
     """
-    Called on a `favorites:<action>:<movie_id>` callback (when user presses "Add to favorites" or "Remove from favorites" button under a movie info).
+    Called on a `favorites_<action>:<movie_id>[|search:<token>]` callback (when user presses "Add to favorites" or "Remove from favorites" button under a movie info).
 
     Updates user favorite movies list and reverts the callback button (for example, if user adds a movie to favorites, the "Add to favorites" button will be changed to "Remove from favorites")
+
+    When a movie is added, its metadata is loaded and stored in background, so the favorites list can be shown without TMDB calls
     """
 
     # parse callback data
-    from_search = callback.data.endswith("|search")
-    command = callback.data.removeprefix("favorites_").removesuffix("|search")
+    command, from_search, results_token = callback.data.removeprefix("favorites_").partition("|search")
+    results_token = results_token.removeprefix(":")
     movie_id = int(command.split(":")[1])
     action = command.split(":")[0]
 
-    db.update_movies_in_user(callback.from_user.id, action, movie_id)
+    await favorites.update(action, movie_id)
 
     if action == "add":
-        await callback.answer(template().ALERT_FAVORITES_ADDED)
+        # the details request of the movie is often not cached (search results are looked up by title),
+        # so the answer doesn't wait for TMDB. If it fails, the metadata is loaded when the list is shown
+        _refresh_movies_meta_in_background(movie_api, db, [movie_id])
+        await callback.answer(templates.ALERT_FAVORITES_ADDED)
         anti_action = "remove"
     elif action == "remove":
-        await callback.answer(template().ALERT_FAVORITES_REMOVED)
+        await callback.answer(templates.ALERT_FAVORITES_REMOVED)
         anti_action = "add"
 
     # change the inline button respectively: if added, set remove and vice versa
     if from_search:
-        markup = SearchResultInlineMarkup(movie_id, anti_action)
+        markup = SearchResultInlineMarkup(movie_id, anti_action, results_token)
     else:
-        markup = InfoInlineMarkup(movie_id, anti_action)
+        markup = InfoInlineMarkup.cached(movie_id, anti_action)
     await callback.message.edit_reply_markup(reply_markup=markup)
 
 
 async def expand_from_button(
     callback: types.CallbackQuery,
     movie_api: MovieAPI,
-    db: FavoritesRedis,
+    favorites: FavoritesSnapshot,
+    posters: PosterFileIds,
 ):
     """
     Called on an `expand_<from>:<movie_id>` callback (when user presses a movie button in a favorites or trending lists).
@@ -86,26 +105,60 @@ async def expand_from_button(
     command = callback.data.removeprefix("expand_")
     source = command.split(":")[0]
     movie_id = int(command.split(":")[1])
-    movie = movie_api.get_movie(movie_id)
+    movie = await movie_api.get_movie(movie_id)
 
     if source == "trending":
         action = (
             "add"
-            if movie_id not in db.get_user_movies(callback.from_user.id)
+            if not await favorites.contains(movie_id)
             else "remove"
         )
     elif source == "favorites":
         # only remove action available
         action = "remove"
 
-    markup = InfoInlineMarkup(movie_id, favorites_action=action)
+    markup = InfoInlineMarkup.cached(movie_id, action)
 
-    await _send_movie(callback.message, movie, markup)
+    await _send_movie(callback.message, movie, markup, posters)
 
     await callback.answer()
 
 
+async def turn_favorites_page(
+    callback: types.CallbackQuery,
+    movie_api: MovieAPI,
+    db: FavoritesRedis,
+):
+    """
+    Called on a `favorites_page:<page>` callback (when user presses "Previous" or "Next" button under the favorites list).
+
+    Edits the favorites list message in place to show the requested page
+    """
+
+    page = callback.data.removeprefix("favorites_page:")
+    if not page.isdigit():
+        # the current page number button
+        await callback.answer()
+        return
+
+    try:
+        markup = await _favorites_page(callback.from_user.id, int(page), movie_api, db)
+
+        if markup is None:
+            await callback.message.edit_text(templates.FAVORITES_LIST_EMPTY)
+        else:
+            await callback.message.edit_reply_markup(reply_markup=markup)
+    except TelegramBadRequest as e:
+        # a double tap asks for the page that is already shown
+        if "message is not modified" not in e.message:
+            raise
+    finally:
+        await callback.answer()
+
+
 def setup(dp: Dispatcher):
+    # registered before `update_favorites`, which handles the rest of `favorites` callbacks
+    dp.callback_query.register(turn_favorites_page, F.data.startswith("favorites_page:"))
     dp.callback_query.register(show_more_results, F.data.startswith("others:"))
     dp.callback_query.register(update_favorites, F.data.startswith("favorites"))
     dp.callback_query.register(expand_from_button, F.data.startswith("expand"))
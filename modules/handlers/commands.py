@@ -3,7 +3,7 @@ from aiogram.filters.command import Command
 from aiogram.fsm.context import FSMContext
 
 from modules.services.database import FavoritesRedis
-from modules.types.common import MessageTemplates as template
+from modules.types.common import templates
 from modules.types.markup import MainMenuMarkup
 
 import config
@@ -19,19 +19,19 @@ async def start(message: types.Message, state: FSMContext, db: FavoritesRedis):
     """
 
     try:
-        db.new_user(message.from_user.id)
-        await message.answer(text=template().START, reply_markup=MainMenuMarkup())
+        await db.new_user(message.from_user.id)
+        await message.answer(text=templates.START, reply_markup=MainMenuMarkup.cached())
         await state.set_state(None)
     except Exception as e:
-        await message.answer(template().START_DB_ERROR)
+        await message.answer(templates.START_DB_ERROR)
 
 
 async def help_msg(message: types.Message):
-    await message.answer(template().HELP)
+    await message.answer(templates.HELP)
 
 
 def setup(dp: Dispatcher):
     dp.message.register(start, Command("start"))
 
     dp.message.register(help_msg, Command("help"))
-    dp.message.register(help_msg, F.text == template().BUTTON_HELP)
+    dp.message.register(help_msg, F.text == templates.BUTTON_HELP)
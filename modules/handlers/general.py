@@ -1,26 +1,44 @@
+import asyncio
+import time
+
 from aiogram import Dispatcher, types, F
 from aiogram.filters.command import Command, CommandObject
 from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.utils.media_group import MediaGroupBuilder
 
 from modules.services.movieAPI import MovieAPI
-from modules.services.database import FavoritesRedis
-from modules.types.common import MessageTemplates as template
-from modules.types.common import SpecialStateMachine, Movie
+from modules.services.database import FavoritesRedis, PosterFileIds, SearchResults
+from modules.middlewares.favorites import FavoritesSnapshot
+from modules.services.trending import TrendingService
+from modules.types.common import templates
+from modules.types.common import SpecialStateMachine, Movie, MovieMeta
 from modules.types.markup import (
     InfoInlineMarkup,
     SearchResultInlineMarkup,
     FavoritesInlineMarkup,
-    TrendingInlineMarkup,
 )
 
+import config
+
+
+# background tasks started by handlers
+_background_tasks: set[asyncio.Task] = set()
+# IDs of the movies whose metadata is being refreshed in background, so each is refreshed once at a time
+_refreshing_meta: set[int] = set()
+
 
 async def _send_movie(
-    message: types.Message, movie: Movie, markup: types.InlineKeyboardMarkup
+    message: types.Message,
+    movie: Movie,
+    markup: types.InlineKeyboardMarkup,
+    posters: PosterFileIds,
 ):
     """
     Internal function for sending movie info to the user in a form of message
 
+    The poster is sent by its Telegram file ID if it has been sent before, otherwise by TMDB URL
+
     Parameters
     ----------
     message : types.Message
@@ -29,14 +47,30 @@ async def _send_movie(
         The movie object to send.
     markup : types.InlineKeyboardMarkup
         The inline keyboard markup to attach to the message.
+    posters : PosterFileIds
+        The storage of sent posters file IDs.
     """
 
     if movie.poster_path:
-        await message.answer_photo(
-            photo=movie.poster_path,
-            caption=movie.text,
-            reply_markup=markup,
-        )
+        file_id = await posters.get(movie.poster_path)
+        try:
+            sent = await message.answer_photo(
+                photo=file_id or movie.poster_path,
+                caption=movie.text,
+                reply_markup=markup,
+            )
+        except TelegramBadRequest:
+            if not file_id:
+                raise
+            # the file ID is no longer valid, send by URL again
+            await posters.forget(movie.poster_path)
+            sent = await message.answer_photo(
+                photo=movie.poster_path,
+                caption=movie.text,
+                reply_markup=markup,
+            )
+
+        await posters.set_many({movie.poster_path: sent.photo[-1].file_id})
     else:
         await message.answer(text=movie.text, reply_markup=markup)
 
@@ -46,7 +80,7 @@ async def _handle_command_search(
 ) -> str | None:
     """Handle search from command with arguments"""
     if not command.args:
-        await message.answer(template().SEARCH_MISSING_QUERY)
+        await message.answer(templates.SEARCH_MISSING_QUERY)
         return None
     return command.args
 
@@ -60,12 +94,15 @@ async def search(
     message: types.Message,
     state: FSMContext,
     movie_api: MovieAPI,
-    db: FavoritesRedis,
+    favorites: FavoritesSnapshot,
+    posters: PosterFileIds,
+    search_results: SearchResults,
     command: CommandObject = None,
 ):
     """
     Called on `/search` command or on user input in `StateMachine.search_input` state.
-    Searches using movie title and sends the best match to the user. Writes other results (if any) to state data
+    Searches using movie title and sends the best match to the user. Other results (if any) are stored
+    in `SearchResults` to be shown by the "Show more results" button
 
     Resets the state
     """
@@ -76,79 +113,208 @@ async def search(
     if not query:
         return
 
-    results = movie_api.search(query)
+    results = await movie_api.search(query)
 
     if not results:
-        await message.answer(template().SEARCH_NOT_FOUND)
+        await message.answer(templates.SEARCH_NOT_FOUND)
         return
 
     best_result = results[0]
 
     action = (
         "add"
-        if best_result.movie_id not in db.get_user_movies(message.from_user.id)
+        if not await favorites.contains(best_result.movie_id)
         else "remove"
     )
 
     if len(results) > 1:
-        other_ids = [result.movie_id for result in results[1:]]
+        token = await search_results.put(results[1:])
 
-        markup = SearchResultInlineMarkup(
-            movie_id=best_result.movie_id,
-            favorites_action=action,
-            other_results_ids=other_ids,
-        )
+        markup = SearchResultInlineMarkup(best_result.movie_id, action, token)
     else:
-        markup = InfoInlineMarkup(
-            movie_id=best_result.movie_id, favorites_action=action
-        )
+        markup = InfoInlineMarkup.cached(best_result.movie_id, action)
 
-    await _send_movie(message, best_result, markup)
+    await _send_movie(message, best_result, markup, posters)
 
     await state.set_state(None)
-    if len(results) > 1:
-        await state.set_data({"other_results": results[1:]})
 
 
-async def list_favorites(
-    message: types.Message, movie_api: MovieAPI, db: FavoritesRedis
-):
+async def _refresh_movies_meta(
+    movie_api: MovieAPI, db: FavoritesRedis, movie_ids: list[int]
+) -> list[MovieMeta]:
+    """
+    Internal function for (re)loading metadata of movies from TMDB and storing it
+
+    Parameters
+    ----------
+    movie_api : MovieAPI
+        The TMDB API client.
+    db : FavoritesRedis
+        The favorites database.
+    movie_ids : list[int]
+        The IDs of the movies.
+
+    Returns
+    -------
+    list[MovieMeta]
+        The metadata of the movies that were loaded successfully.
+    """
+
+    metas = [MovieMeta.from_movie(movie) for movie in await movie_api.movie_factory(movie_ids)]
+    await db.set_movies_meta(metas)
+
+    return metas
+
+
+def _refresh_movies_meta_in_background(movie_api: MovieAPI, db: FavoritesRedis, movie_ids: list[int]):
+    """
+    Internal function for (re)loading metadata of movies in background (see `_refresh_movies_meta`).
+    The movies whose metadata is already being loaded are skipped
+
+    Parameters
+    ----------
+    movie_api : MovieAPI
+        The TMDB API client.
+    db : FavoritesRedis
+        The favorites database.
+    movie_ids : list[int]
+        The IDs of the movies.
+    """
+
+    movie_ids = [movie_id for movie_id in movie_ids if movie_id not in _refreshing_meta]
+    if not movie_ids:
+        return
+
+    _refreshing_meta.update(movie_ids)
+    task = asyncio.create_task(_refresh_movies_meta(movie_api, db, movie_ids))
+    # keep a reference, so the task is not garbage collected before it is done
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    task.add_done_callback(lambda task: _refreshing_meta.difference_update(movie_ids))
+
+
+async def _favorites_page(
+    user_id: int, page: int, movie_api: MovieAPI, db: FavoritesRedis
+) -> FavoritesInlineMarkup | None:
+    """
+    Internal function for building a page of a user's favorites list
+
+    Only the movies on the page are read. Titles are taken from the metadata stored in Redis, TMDB is only called
+    for movies without metadata (added before it was stored), and to refresh outdated metadata in background
+
+    Parameters
+    ----------
+    user_id : int
+        The Telegram ID of the user.
+    page : int
+        The number of the page, starting from 0. If it is past the end of the list, the last page is built.
+    movie_api : MovieAPI
+        The TMDB API client.
+    db : FavoritesRedis
+        The favorites database.
+
+    Returns
+    -------
+    FavoritesInlineMarkup | None
+        The markup of the page, None if the user has no favorites.
+    """
+
+    page_size = config.FAVORITES_PAGE_SIZE
+    favorites, total = await db.get_user_favorites_page(user_id, page * page_size, page_size)
+    if not total:
+        return None
+
+    pages = -(-total // page_size)
+    if page >= pages:
+        # some movies were removed since the page was shown
+        page = pages - 1
+        favorites, total = await db.get_user_favorites_page(user_id, page * page_size, page_size)
+
+    missing_ids = [movie_id for movie_id, meta in favorites.items() if meta is None]
+    if missing_ids:
+        for meta in await _refresh_movies_meta(movie_api, db, missing_ids):
+            favorites[meta.movie_id] = meta
+
+    outdated_ids = [
+        movie_id
+        for movie_id, meta in favorites.items()
+        if meta is not None and meta.updated_at < time.time() - config.FAVORITES_META_MAX_AGE
+    ]
+    if outdated_ids:
+        _refresh_movies_meta_in_background(movie_api, db, outdated_ids)
+
+    return FavoritesInlineMarkup(
+        [meta for meta in favorites.values() if meta is not None], page, pages
+    )
+
+
+async def list_favorites(message: types.Message, movie_api: MovieAPI, db: FavoritesRedis):
     """
     Called on `/favorites` command or on button "Show favorites" in main menu.
 
-    Sends the user a list of all their favorites in a form of inline buttons
+    Sends the user the first page of their favorites in a form of inline buttons, with buttons to turn pages
     """
 
-    favorites = db.get_user_movies(message.from_user.id)
+    markup = await _favorites_page(message.from_user.id, 0, movie_api, db)
 
-    if not favorites:
-        await message.answer(template().FAVORITES_LIST_EMPTY)
+    if markup is None:
+        await message.answer(templates.FAVORITES_LIST_EMPTY)
         return
 
-    markup = FavoritesInlineMarkup(movie_api.movie_factory(favorites))
-    await message.answer(text=template().BUTTON_FAVORITES_SHOW, reply_markup=markup)
+    await message.answer(text=templates.BUTTON_FAVORITES_SHOW, reply_markup=markup)
 
 
-async def trending(message: types.Message, movie_api: MovieAPI):
+async def trending(
+    message: types.Message,
+    trending_service: TrendingService,
+    posters: PosterFileIds,
+):
     """
     Called on `/trending` command or on the corresponding button in main menu.
 
     Sends the user a list of 7 currently trending movies in a form of 2 messages:
     - Group of poster photos
     - One text message with brief movies info and inline buttons to retrieve further info
-    """
 
-    trending = movie_api.get_trending()
+    The list is prepared in background by `TrendingService`
+    """
 
-    media_group = MediaGroupBuilder()
-    text = ""
+    await trending_service.ensure_ready()
+    movies, text, markup = (
+        trending_service.movies,
+        trending_service.text,
+        trending_service.markup,
+    )
 
-    for i, movie in enumerate(trending):
-        media_group.add_photo(media=movie.poster_path)
-        text += f"<b>{i + 1}.</b> {movie.text_brief}\n"
+    poster_paths = [movie.poster_path for movie in movies]
+    file_ids = await posters.get_many(poster_paths)
+
+    def build_media_group(file_ids: list[str | None]) -> list:
+        media_group = MediaGroupBuilder()
+        for poster_path, file_id in zip(poster_paths, file_ids):
+            media_group.add_photo(media=file_id or poster_path)
+        return media_group.build()
+
+    try:
+        sent = await message.answer_media_group(media=build_media_group(file_ids))
+    except TelegramBadRequest:
+        if not any(file_ids):
+            raise
+        # some file ID is no longer valid, send by URLs again
+        for poster_path, file_id in zip(poster_paths, file_ids):
+            if file_id:
+                await posters.forget(poster_path)
+        sent = await message.answer_media_group(
+            media=build_media_group([None] * len(poster_paths))
+        )
 
-    await message.answer_media_group(media=media_group.build())
-    await message.answer(text, reply_markup=TrendingInlineMarkup(trending))
+    await posters.set_many(
+        {
+            poster_path: photo_message.photo[-1].file_id
+            for poster_path, photo_message in zip(poster_paths, sent)
+        }
+    )
+    await message.answer(text, reply_markup=markup)
 
 
 def setup(dp: Dispatcher):
@@ -156,7 +322,7 @@ def setup(dp: Dispatcher):
     dp.message.register(search, F.text, SpecialStateMachine.search_input)
 
     dp.message.register(list_favorites, Command("favorites"))
-    dp.message.register(list_favorites, F.text == template().BUTTON_FAVORITES_SHOW)
+    dp.message.register(list_favorites, F.text == templates.BUTTON_FAVORITES_SHOW)
 
     dp.message.register(trending, Command("trending"))
-    dp.message.register(trending, F.text == template().BUTTON_TRENDING)
+    dp.message.register(trending, F.text == templates.BUTTON_TRENDING)
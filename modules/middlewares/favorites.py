@@ -0,0 +1,121 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, User
+
+from modules.services.database import FavoritesRedis
+
+
+class FavoritesSnapshot:
+    """
+    Class representing favorite movies of the user who sent the update.
+
+    The list is read from Redis lazily, on the first access, and at most once per update.
+    Writes go to Redis right away and are applied to the snapshot too.
+
+    Methods
+    -------
+    movies() -> list[int]
+        Get the list of favorite movies
+    contains(movie_id) -> bool
+        Check if a movie is in the favorites
+    update(action, movie_id)
+        Add or remove a movie
+    """
+
+    def __init__(self, db: FavoritesRedis, user_id: int):
+        """
+        Parameters
+        ----------
+        db : FavoritesRedis
+            The favorites database.
+        user_id : int
+            The Telegram ID of the user.
+        """
+
+        self.db = db
+        self.user_id = user_id
+
+        self._movies: list[int] | None = None
+        self._movie_ids: set[int] = set()
+
+    async def movies(self) -> list[int]:
+        """
+        Get the list of favorite movies
+
+        Returns
+        -------
+        list[int]
+            A list of favorite movie IDs, in the order they were added.
+        """
+
+        if self._movies is None:
+            self._movies = await self.db.get_user_movies(self.user_id)
+            self._movie_ids = set(self._movies)
+
+        return self._movies
+
+    async def contains(self, movie_id: int) -> bool:
+        """
+        Check if a movie is in the favorites
+
+        Parameters
+        ----------
+        movie_id : int
+            The ID of the movie.
+
+        Returns
+        -------
+        bool
+            True if the movie is in the favorites.
+        """
+
+        await self.movies()
+        return movie_id in self._movie_ids
+
+    async def update(self, action: str, movie_id: int):
+        """
+        Add or remove a movie. See `FavoritesRedis.update_movies_in_user`
+
+        Parameters
+        ----------
+        action : str
+            The action to perform: "add" or "remove" a movie
+        movie_id : int
+            The ID of the movie to add or remove
+        """
+
+        await self.db.update_movies_in_user(self.user_id, action, movie_id)
+
+        if self._movies is None:
+            return
+
+        if action == "add" and movie_id not in self._movie_ids:
+            self._movies.append(movie_id)
+            self._movie_ids.add(movie_id)
+        elif action == "remove" and movie_id in self._movie_ids:
+            self._movies.remove(movie_id)
+            self._movie_ids.discard(movie_id)
+
+
+class FavoritesSnapshotMiddleware(BaseMiddleware):
+    """
+    Middleware that passes a `FavoritesSnapshot` of the user to handlers as the `favorites` argument
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is not None:
+            data["favorites"] = FavoritesSnapshot(data["db"], user.id)
+
+        return await handler(event, data)
+
+
+def setup(dp: Dispatcher):
+    dp.message.middleware(FavoritesSnapshotMiddleware())
+    dp.callback_query.middleware(FavoritesSnapshotMiddleware())
@@ -0,0 +1,47 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+
+from modules.services.metrics import HANDLER_ERRORS, HANDLER_LATENCY
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Middleware recording the latency (and failures) of handlers, labeled by the event type and the handler name
+    """
+
+    def __init__(self, event: str):
+        """
+        Parameters
+        ----------
+        event : str
+            The type of the events the middleware is set up for, e.g. "message".
+        """
+
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object: HandlerObject | None = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(self.event, name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(self.event, name, value=time.perf_counter() - start)
+
+
+def setup(dp: Dispatcher):
+    dp.message.middleware(HandlerMetricsMiddleware("message"))
+    dp.callback_query.middleware(HandlerMetricsMiddleware("callback_query"))
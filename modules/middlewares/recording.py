@@ -0,0 +1,188 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Iterator
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+
+logger = logging.getLogger(__name__)
+
+
+# Keys of the objects (users and chats) identifying a person
+_ACCOUNT_KEYS = frozenset(
+    ("from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat", "via_bot")
+)
+# Fields of such objects that are kept as is: the rest (names, usernames) are dropped
+_ACCOUNT_FIELDS = ("is_bot", "type", "language_code")
+
+
+def anonymous_id(account_id: int, salt: bytes) -> int:
+    """
+    Get the anonymous ID of a user or a chat: a keyed hash of the ID, so it is the same in all the updates
+    recorded with the same salt, but cannot be traced back to the account
+
+    Parameters
+    ----------
+    account_id : int
+        The Telegram ID of the user or the chat.
+    salt : bytes
+        The key of the hash.
+
+    Returns
+    -------
+    int
+        A 48-bit ID, with the sign of the original one (group chats have negative IDs).
+    """
+
+    digest = hmac.new(salt, str(abs(account_id)).encode(), hashlib.sha256).digest()
+    anonymous = int.from_bytes(digest[:6], "big") or 1
+    return -anonymous if account_id < 0 else anonymous
+
+
+def anonymize(data: Any, salt: bytes) -> Any:
+    """
+    Anonymize an update (as a JSON-compatible dict): the IDs of users and chats are replaced with
+    `anonymous_id`, their names and usernames are dropped (first names are kept as "-", as they are required)
+
+    Parameters
+    ----------
+    data : Any
+        The update or a part of it.
+    salt : bytes
+        The key of the ID hashes.
+
+    Returns
+    -------
+    Any
+        The anonymized copy of the data.
+    """
+
+    if isinstance(data, list):
+        return [anonymize(item, salt) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    anonymized = {}
+    for key, value in data.items():
+        if key in _ACCOUNT_KEYS and isinstance(value, dict):
+            account = {"id": anonymous_id(value["id"], salt)}
+            account.update(
+                (field, value[field]) for field in _ACCOUNT_FIELDS if field in value
+            )
+            if "first_name" in value:
+                account["first_name"] = "-"
+            anonymized[key] = account
+        elif key == "chat_instance":
+            anonymized[key] = hmac.new(salt, value.encode(), hashlib.sha256).hexdigest()[:16]
+        else:
+            anonymized[key] = anonymize(value, salt)
+
+    return anonymized
+
+
+def read_records(path: str) -> Iterator[tuple[float, dict]]:
+    """
+    Read the updates recorded by `UpdateRecorder`, in the order they were written.
+    A line left incomplete (by a crash while writing) is skipped
+
+    Parameters
+    ----------
+    path : str
+        The path of the log file.
+
+    Returns
+    -------
+    Iterator[tuple[float, dict]]
+        The time each update was received (UNIX time in seconds) and the update.
+    """
+
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipped a malformed record in %s", path)
+                continue
+            yield record["t"], record["u"]
+
+
+class UpdateRecorder(BaseMiddleware):
+    """
+    Outer middleware appending every incoming update, anonymized (see `anonymize`), to a log file.
+
+    The log has a compact JSON object per line: `{"t": <UNIX time received>, "u": <update>}`.
+    Each line is appended with a single write to a file opened in append mode, so worker processes
+    can share the file, and a crash loses at most the line being written. Read the log with `read_records`.
+
+    Methods
+    -------
+    close()
+        Close the log file
+    """
+
+    def __init__(self, path: str, salt: bytes | None = None):
+        """
+        Parameters
+        ----------
+        path : str
+            The path of the log file. It is created if it doesn't exist.
+        salt : bytes | None, optional
+            The key of the ID hashes. Default is None: a random one, so the IDs differ between processes and runs.
+        """
+
+        self.path = path
+        self.salt = salt or secrets.token_bytes(16)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            try:
+                self.record(event)
+            except Exception as e:
+                # recording must never break update handling
+                logger.warning("Update %d recording failed: %r", event.update_id, e)
+
+        return await handler(event, data)
+
+    def record(self, update: Update):
+        """
+        Append the update to the log
+
+        Parameters
+        ----------
+        update : Update
+            The received update.
+        """
+
+        update_data = anonymize(
+            update.model_dump(mode="json", by_alias=True, exclude_unset=True, exclude_none=True),
+            self.salt,
+        )
+        line = json.dumps(
+            {"t": round(time.time(), 3), "u": update_data},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        os.write(self._fd, line.encode() + b"\n")
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def setup(dp: Dispatcher, path: str, salt: bytes | None = None) -> UpdateRecorder:
+    recorder = UpdateRecorder(path, salt)
+    dp.update.outer_middleware(recorder)
+    return recorder
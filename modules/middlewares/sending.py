@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    EditMessageCaption,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    TelegramMethod,
+)
+
+from modules.services.metrics import REGISTRY, Gauge
+
+
+logger = logging.getLogger(__name__)
+
+
+# Priorities of sends: lower are sent first
+INTERACTIVE = 0
+BULK = 1
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_sends():
+    """
+    Context manager marking the sends made inside it as bulk: they yield to interactive replies in other chats
+    """
+
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Class representing a token bucket: `rate` tokens per second are added, up to `capacity`.
+
+    Taking tokens may leave the bucket in debt, so a send costing more than the capacity (a media group)
+    is let through at once, and the following sends wait until the debt is repaid.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def ready_at(self, now: float) -> float:
+        """
+        The time (monotonic) when the bucket has a whole token to take
+        """
+
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def take(self, cost: float, now: float):
+        self._refill(now)
+        self.tokens -= cost
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Waiter:
+    __slots__ = ("priority", "order", "cost", "future", "queued_at")
+
+    def __init__(self, priority: int, order: int, cost: int, future: asyncio.Future):
+        self.priority = priority
+        self.order = order
+        self.cost = cost
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Bot request middleware shaping outbound messages to stay within Telegram flood limits.
+
+    Sends (messages, photos, media groups and message edits) wait for a token from the bucket of their chat
+    and from the global bucket. Sends to one chat go out in order. Among chats ready to send,
+    interactive replies go before bulk sends (see `bulk_sends`). A media group costs a global token per item,
+    but a single token of its chat, so the message following an album (like the `/trending` list) is not delayed.
+    If Telegram still answers with "retry after", the chat is paused for that long and the send is retried.
+    Other requests pass through untouched.
+
+    Methods
+    -------
+    depth() -> int
+        The number of sends waiting in the queue
+    stats() -> dict
+        Counters: sends, retries, queue depth and wait times
+    """
+
+    SHAPED_METHODS = (
+        SendMessage,
+        SendPhoto,
+        SendMediaGroup,
+        EditMessageText,
+        EditMessageCaption,
+        EditMessageReplyMarkup,
+    )
+
+    # the number of chat buckets above which the full (idle) ones are dropped
+    MAX_IDLE_BUCKETS = 10000
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3,
+    ):
+        """
+        Parameters
+        ----------
+        global_rate : float, optional
+            Sends per second to all chats together (also the global burst). Default is 30.
+        chat_rate : float, optional
+            Sends per second to one chat. Default is 1.
+        chat_burst : float, optional
+            Sends to one chat that can go out at once after a pause. Default is 3.
+        max_retries : int, optional
+            How many times a send is retried after a "retry after" answer. Default is 3.
+        """
+
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets: dict[Any, TokenBucket] = {}
+        self._paused_until: dict[Any, float] = {}
+        self._queues: dict[Any, deque[_Waiter]] = {}
+        self._order = count()
+
+        self._wakeup = asyncio.Event()
+        self._scheduler: asyncio.Task | None = None
+
+        self.sent = 0
+        self.retries = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        _schedulers.add(self)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not isinstance(method, self.SHAPED_METHODS):
+            return await make_request(bot, method)
+
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, cost)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("Flood control in chat %s, pausing it for %d s", chat_id, e.retry_after)
+                self._paused_until[chat_id] = time.monotonic() + e.retry_after
+                self.retries += 1
+
+    def depth(self) -> int:
+        """
+        The number of sends waiting in the queue
+        """
+
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> dict[str, float]:
+        """
+        Counters: sends, retries, queue depth, and total, average and maximum wait time in seconds
+        """
+
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "depth": self.depth(),
+            "wait_total": self.wait_total,
+            "wait_avg": self.wait_total / self.sent if self.sent else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+    async def _acquire(self, chat_id: Any, cost: int):
+        """
+        Wait until the send is let through by the scheduler (internal)
+        """
+
+        waiter = _Waiter(
+            _priority.get(), next(self._order), cost, asyncio.get_running_loop().create_future()
+        )
+        self._queues.setdefault(chat_id, deque()).append(waiter)
+
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.create_task(self._schedule())
+        self._wakeup.set()
+
+        await waiter.future
+
+        waited = time.monotonic() - waiter.queued_at
+        self.sent += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def _bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) > self.MAX_IDLE_BUCKETS:
+                now = time.monotonic()
+                self._buckets = {
+                    chat: bucket
+                    for chat, bucket in self._buckets.items()
+                    if chat in self._queues or not bucket.full(now)
+                }
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+
+        return bucket
+
+    async def _schedule(self):
+        """
+        Let the waiting sends through as the buckets allow, until the queue is empty (internal)
+        """
+
+        while self._queues:
+            self._wakeup.clear()
+            now = time.monotonic()
+            next_at = float("inf")
+
+            # the first waiting send of the chats that can send now, best priority first
+            best_chat, best = None, None
+            for chat_id, queue in list(self._queues.items()):
+                while queue and queue[0].future.done():
+                    # the handler was cancelled
+                    queue.popleft()
+                if not queue:
+                    del self._queues[chat_id]
+                    continue
+
+                ready_at = max(
+                    self._bucket(chat_id).ready_at(now), self._paused_until.get(chat_id, 0)
+                )
+                head = queue[0]
+                if ready_at > now:
+                    next_at = min(next_at, ready_at)
+                elif best is None or (head.priority, head.order) < (best.priority, best.order):
+                    best_chat, best = chat_id, head
+
+            if best is not None:
+                global_ready_at = self._global.ready_at(now)
+                if global_ready_at <= now:
+                    self._queues[best_chat].popleft()
+                    if not self._queues[best_chat]:
+                        del self._queues[best_chat]
+                    self._paused_until.pop(best_chat, None)
+                    # an album is one message in its chat
+                    self._bucket(best_chat).take(1, now)
+                    self._global.take(best.cost, now)
+                    best.future.set_result(None)
+                    continue
+                next_at = min(next_at, global_ready_at)
+
+            if next_at == float("inf"):
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=next_at - now)
+            except asyncio.TimeoutError:
+                pass
+
+
+# The schedulers of this process, read by the metrics below (registered once, whatever the number of bots)
+_schedulers: weakref.WeakSet[SendScheduler] = weakref.WeakSet()
+
+
+def _wait_avg() -> float:
+    sent = sum(scheduler.sent for scheduler in _schedulers)
+    return sum(scheduler.wait_total for scheduler in _schedulers) / sent if sent else 0.0
+
+
+REGISTRY.register(
+    Gauge(
+        "bot_send_queue_depth",
+        "Outbound sends waiting for a token",
+        lambda: sum(scheduler.depth() for scheduler in _schedulers),
+    )
+)
+REGISTRY.register(
+    Gauge("bot_send_wait_seconds_avg", "Average time outbound sends waited for a token", _wait_avg)
+)
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from redis.asyncio import StrictRedis
+
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with a per-entry time to live and LRU eviction.
+
+    Once the cache holds `max_size` entries, adding a new one evicts the least recently used entry.
+    Expired entries are dropped lazily, when they are looked up.
+
+    Methods
+    -------
+    get(key, default) -> Any
+        Get a value from the cache
+    set(key, value, ttl)
+        Put a value into the cache
+    delete(key)
+        Remove an entry from the cache
+    clear()
+        Remove all entries from the cache
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Parameters
+        ----------
+        max_size : int, optional
+            The maximum number of entries kept in the cache. Default is 1024.
+        """
+
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # does not count as a hit or a miss and does not affect the LRU order
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value from the cache
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the entry.
+        default : Any, optional
+            The value to return if there is no live entry for the key. Default is None.
+
+        Returns
+        -------
+        Any
+            The cached value, or `default` on a miss.
+        """
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """
+        Put a value into the cache
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the entry.
+        value : Any
+            The value to cache.
+        ttl : float
+            The time to live of the entry in seconds.
+        """
+
+        if self.max_size <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """
+        Remove an entry from the cache, if there is one
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the entry.
+        """
+
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        """
+
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Cache counters: hits, misses, evictions, expirations and current size
+        """
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+        }
+
+
+class RedisMovieCache:
+    """
+    Shared Redis cache of hydrated movies and search results, used by all bot replicas.
+
+    Every entry has a soft and a hard time to live. Until the soft TTL passes, the entry is fresh.
+    Between the soft and the hard TTL the stale value is still returned right away,
+    and a background refresh is started (at most one per key across all replicas).
+    After the hard TTL Redis drops the entry and the next request loads it again.
+
+    An entry is binary: a header with the format version and the soft expiration time, followed by the value
+    as encoded by the caller (for example with `Movie.to_bytes`). An entry in another format is treated as a miss.
+
+    Methods
+    -------
+    get_or_load(key, loader, encode, decode) -> Any
+        Get a value from the cache, loading it with `loader` on a miss
+    """
+
+    KEY_PREFIX = "tmdb_cache:"
+    LOCK_PREFIX = "tmdb_cache_lock:"
+
+    # entry header: format version and soft expiration time (UNIX time)
+    ENTRY_VERSION = 1
+    _ENTRY_HEADER = struct.Struct("<Bd")
+
+    def __init__(
+        self,
+        redis: StrictRedis,
+        soft_ttl: int = 6 * 60 * 60,
+        hard_ttl: int = 3 * 24 * 60 * 60,
+        refresh_lock_ttl: int = 30,
+    ):
+        """
+        Parameters
+        ----------
+        redis : StrictRedis
+            An async binary Redis client (with `decode_responses=False`), usually `FavoritesRedis.raw`.
+        soft_ttl : int, optional
+            Seconds after which an entry is refreshed in background. Default is 6 hours.
+        hard_ttl : int, optional
+            Seconds after which an entry is removed. Default is 3 days.
+        refresh_lock_ttl : int, optional
+            Seconds for which a replica holds the right to refresh a key. Default is 30.
+        """
+
+        self.redis = redis
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.refresh_lock_ttl = refresh_lock_ttl
+
+        # keep references to background refreshes so they are not garbage collected
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[bool], Awaitable[Any]],
+        encode: Callable[[Any], bytes],
+        decode: Callable[[bytes], Any],
+    ) -> Any:
+        """
+        Get a value from the cache, loading it with `loader` on a miss
+
+        Redis errors are logged and treated as misses, so the cache never breaks a request.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        loader : Callable[[bool], Awaitable[Any]]
+            Loads the value from the source. Called with `refresh=True` from background refreshes,
+            meaning that lower cache levels must be bypassed.
+        encode : Callable[[Any], bytes]
+            Converts the value to bytes.
+        decode : Callable[[bytes], Any]
+            Converts the bytes back to the value. Raises `ValueError` if they are malformed.
+
+        Returns
+        -------
+        Any
+            The cached or loaded value.
+        """
+
+        try:
+            raw = await self.redis.get(self.KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning("Shared cache read failed: %r", e)
+            raw = None
+
+        if raw is not None:
+            try:
+                version, soft_expires_at = self._ENTRY_HEADER.unpack_from(raw)
+                if version != self.ENTRY_VERSION:
+                    raise ValueError(f"unsupported entry version {version}")
+                value = decode(raw[self._ENTRY_HEADER.size :])
+            except (ValueError, struct.error) as e:
+                # written by another version of the bot: replaced below
+                logger.warning("Shared cache entry %s is unreadable: %r", key, e)
+            else:
+                if soft_expires_at <= time.time():
+                    self._schedule_refresh(key, loader, encode)
+                return value
+
+        value = await loader(False)
+        await self._store(key, value, encode)
+
+        return value
+
+    async def _store(self, key: str, value: Any, encode: Callable[[Any], bytes]):
+        """
+        Write an entry to Redis with a fresh soft TTL (internal)
+        """
+
+        entry = self._ENTRY_HEADER.pack(self.ENTRY_VERSION, time.time() + self.soft_ttl) + encode(value)
+        try:
+            await self.redis.set(self.KEY_PREFIX + key, entry, ex=self.hard_ttl)
+        except Exception as e:
+            logger.warning("Shared cache write failed: %r", e)
+
+    def _schedule_refresh(
+        self,
+        key: str,
+        loader: Callable[[bool], Awaitable[Any]],
+        encode: Callable[[Any], bytes],
+    ):
+        """
+        Start a background refresh of a stale entry, unless one is already running (internal)
+        """
+
+        if key in self._refreshing:
+            return
+
+        task = asyncio.create_task(self._refresh(key, loader, encode))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(
+        self,
+        key: str,
+        loader: Callable[[bool], Awaitable[Any]],
+        encode: Callable[[Any], bytes],
+    ):
+        """
+        Reload a stale entry if no other replica is doing it already (internal)
+        """
+
+        try:
+            acquired = await self.redis.set(
+                self.LOCK_PREFIX + key, 1, nx=True, ex=self.refresh_lock_ttl
+            )
+            if not acquired:
+                return
+
+            value = await loader(True)
+            await self._store(key, value, encode)
+        except Exception as e:
+            logger.warning("Shared cache refresh of %s failed: %r", key, e)
@@ -0,0 +1,73 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call with some key is in flight,
+    other callers with the same key wait for its result instead of making their own call.
+
+    The result (or the exception) of the call is delivered to every waiter.
+    A waiter being cancelled does not affect the others; the call itself is cancelled
+    only when all its waiters are gone, and it's forgotten at once, so a later caller starts a new call
+    instead of joining the one being cancelled.
+
+    Methods
+    -------
+    do(key, func) -> Any
+        Run `func` or join the call already in flight for `key`
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        # the number of callers waiting for each call in flight
+        self._waiters: Counter[asyncio.Future] = Counter()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `func` or join the call already in flight for `key`
+
+        Parameters
+        ----------
+        key : Hashable
+            The key identifying the call.
+        func : Callable[[], Awaitable[Any]]
+            Makes the call. Only invoked if there is no call in flight for `key`.
+
+        Returns
+        -------
+        Any
+            The result of the call.
+        """
+
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+
+        self._waiters[call] += 1
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            if self._waiters[call] == 1 and not call.done():
+                # the last waiter is gone, nobody needs the result anymore
+                self._forget(key, call)
+                call.cancel()
+            raise
+        finally:
+            self._waiters[call] -= 1
+            if not self._waiters[call]:
+                del self._waiters[call]
+
+    def _forget(self, key: Hashable, call: asyncio.Future):
+        """
+        Remove a finished or cancelled call, so the next caller with the same key starts a new one (internal)
+        """
+
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -1,26 +1,137 @@
-import json
-import redis
+import functools
+import secrets
+import time
+from contextvars import ContextVar
+from redis.asyncio import BlockingConnectionPool, StrictRedis
+
+from modules.services.cache import TTLCache
+from modules.services.metrics import REDIS_LATENCY
+from modules.types.common import Movie, MovieMeta
+
+
+# Moves a legacy JSON list of favorites (KEYS[1]) into a sorted set (KEYS[2]).
+# Legacy movies get scores 1..n, so they keep their order and stay before the ones added later (scored by time)
+MIGRATE_LEGACY_FAVORITES = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+local ok, movie_ids = pcall(cjson.decode, raw)
+if not ok or type(movie_ids) ~= 'table' then
+    return 0
+end
+for i, movie_id in ipairs(movie_ids) do
+    redis.call('ZADD', KEYS[2], 'NX', i, movie_id)
+end
+redis.call('DEL', KEYS[1])
+return #movie_ids
+"""
+
+# Reads a range (ARGV[1]..ARGV[2]) of a user's favorites (KEYS[1]) with the metadata of each movie
+# (from the KEYS[2] hash) and the total number of favorites, in one round trip.
+# The metadata is read in chunks, as `unpack` of a long list overflows the Lua stack
+GET_FAVORITES_META = """
+local total = redis.call('ZCARD', KEYS[1])
+local movie_ids = redis.call('ZRANGE', KEYS[1], ARGV[1], ARGV[2])
+if #movie_ids == 0 then
+    return {total}
+end
+local metas = {}
+for first = 1, #movie_ids, 1000 do
+    local last = math.min(first + 999, #movie_ids)
+    local chunk = redis.call('HMGET', KEYS[2], unpack(movie_ids, first, last))
+    for i = 1, #chunk do
+        metas[#metas + 1] = chunk[i]
+    end
+end
+return {total, movie_ids, metas}
+"""
+
+
+# Whether a timed operation is running in the current task, so the operations it calls are not timed again
+_timing: ContextVar[bool] = ContextVar("redis_timing", default=False)
+
+
+def _timed(method):
+    """
+    Decorator recording the time taken by a database operation, labeled by the method name.
+    Only the outermost operation is recorded: one called by another timed operation counts towards that one
+    """
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        if _timing.get():
+            return await method(*args, **kwargs)
+
+        token = _timing.set(True)
+        try:
+            with REDIS_LATENCY.time(method.__name__):
+                return await method(*args, **kwargs)
+        finally:
+            _timing.reset(token)
+
+    return wrapper
 
 
 class FavoritesRedis:
     """
     Class to interact with the Redis database of users` favorite movies.
 
+    Uses an async client on a shared, sized connection pool, so Redis round trips don't block the event loop.
+    The client (`r`) can be shared with other Redis-backed services. The binary client (`raw`), on a pool of its own,
+    returns values as bytes, for the services storing binary data (like movies packed with `Movie.to_bytes`).
+
+    Favorites of a user are stored in a sorted set `favorites:<user_id>` scored by the time they were added.
+    The legacy format (a JSON list under the bare user ID) can be converted with `migrate_legacy_favorites`.
+    Compact metadata of favorited movies (see `MovieMeta`) is kept in the `movie_meta` hash shared by all users,
+    so the favorites list can be shown without TMDB calls.
+
+    The time taken by every operation is recorded in the `redis_operation_seconds` metric.
+
     Methods
     -------
     get_user_movies(user_id)
         Get the list of favorite movies for a user
-    _set_user_movies(user_id, movies)
-        Set the list of favorite movies for a user (internal)        
+    has_movie(user_id, movie_id)
+        Check if a movie is in a user's favorites
+    count_user_movies(user_id)
+        Get the number of favorite movies of a user
+    get_user_favorites(user_id)
+        Get the favorite movies of a user with their metadata
+    get_user_favorites_page(user_id, offset, limit)
+        Get a range of the favorite movies of a user with their metadata
+    set_movies_meta(metas)
+        Store metadata of movies
     update_movies_in_user(user_id, action, movie_id)
         Update a user's favorite movies list
     new_user(user_id)
         Create a new user with an empty movies list (on /start command)
     clear_user_movies(user_id)
         Clear a user's favorite movies list
+    migrate_legacy_user(user_id)
+        Move a user's favorites from the legacy JSON list to the sorted set
+    migrate_legacy_favorites()
+        Move all users' favorites from legacy JSON lists to sorted sets
+    close()
+        Close the connection pools
     """
+
+    KEY_PREFIX = "favorites:"
+    META_KEY = "movie_meta"
+    # set once all legacy favorites have been migrated, so later startups skip the scan
+    MIGRATED_KEY = "favorites_migrated"
     
-    def __init__(self, host, port, password = None):
+    def __init__(
+        self,
+        host,
+        port,
+        password=None,
+        max_connections=50,
+        pool_timeout=5,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+        health_check_interval=30,
+    ):
         """
         Initialize the Redis connection
 
@@ -32,13 +143,55 @@ class FavoritesRedis:
             The port number of the Redis server
         password: str
             The password of the Redis. Default is None.
+        max_connections: int
+            The size of each connection pool (text and binary). Default is 50.
+        pool_timeout: float
+            Seconds to wait for a free connection when all of them are busy. Default is 5.
+        socket_timeout: float
+            Seconds to wait for a Redis reply. Default is 5.
+        socket_connect_timeout: float
+            Seconds to wait for a connection to be established. Default is 5.
+        health_check_interval: float
+            Idle connections are checked with a PING after this many seconds. Default is 30.
         """
         
-        self.r = redis.StrictRedis(
-            host=host, port=port, password=password, decode_responses=True
+        pool_settings = dict(
+            host=host,
+            port=port,
+            password=password,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_connect_timeout,
+            health_check_interval=health_check_interval,
         )
+        self.pool = BlockingConnectionPool(decode_responses=True, **pool_settings)
+        self.r = StrictRedis(connection_pool=self.pool)
+        # decoding is a setting of the connections, so binary values need a pool of their own
+        self.raw_pool = BlockingConnectionPool(decode_responses=False, **pool_settings)
+        self.raw = StrictRedis(connection_pool=self.raw_pool)
+        self._migrate_script = self.r.register_script(MIGRATE_LEGACY_FAVORITES)
+        self._get_favorites_meta_script = self.r.register_script(GET_FAVORITES_META)
+
+    async def close(self):
+        """
+        Close the connection pools
+        """
+
+        await self.r.aclose()
+        await self.pool.disconnect()
+        await self.raw.aclose()
+        await self.raw_pool.disconnect()
+
+    def _key(self, user_id: int) -> str:
+        """
+        Get the Redis key of a user's favorites sorted set (internal)
+        """
 
-    def get_user_movies(self, user_id: int) -> list[int]:
+        return self.KEY_PREFIX + str(user_id)
+
+    @_timed
+    async def get_user_movies(self, user_id: int) -> list[int]:
         """
         Get the list of favorite movies for a user
 
@@ -50,32 +203,126 @@ class FavoritesRedis:
         Returns
         -------
         list[int]
-            A list of favorite movie IDs.
+            A list of favorite movie IDs, in the order they were added.
         """
 
-        favorites = self.r.get(user_id)
-        if not favorites:
-            return []
-        else:
-            return json.loads(favorites)
-    
-    def _set_user_movies(self, user_id: int, movies: list[int]):
+        return [int(movie_id) for movie_id in await self.r.zrange(self._key(user_id), 0, -1)]
+
+    @_timed
+    async def has_movie(self, user_id: int, movie_id: int) -> bool:
         """
-        Set the list of favorite movies for a user (internal)
+        Check if a movie is in a user's favorites
 
         Parameters
         ----------
         user_id : int
             The Telegram ID of the user.
-        movies : list[int]
-            A list of favorite movie IDs.
+        movie_id : int
+            The ID of the movie.
+
+        Returns
+        -------
+        bool
+            True if the movie is in the user's favorites.
         """
-        
-        self.r.set(user_id, json.dumps(movies))
 
-    def update_movies_in_user(self, user_id: int, action: str, movie_id: int):
+        return await self.r.zscore(self._key(user_id), movie_id) is not None
+
+    @_timed
+    async def count_user_movies(self, user_id: int) -> int:
         """
-        Update a user's favorite movies list
+        Get the number of favorite movies of a user
+
+        Parameters
+        ----------
+        user_id : int
+            The Telegram ID of the user.
+
+        Returns
+        -------
+        int
+            The number of favorite movies.
+        """
+
+        return await self.r.zcard(self._key(user_id))
+
+    @_timed
+    async def get_user_favorites(self, user_id: int) -> dict[int, MovieMeta | None]:
+        """
+        Get the favorite movies of a user with their metadata, in one round trip
+
+        Parameters
+        ----------
+        user_id : int
+            The Telegram ID of the user.
+
+        Returns
+        -------
+        dict[int, MovieMeta | None]
+            Metadata by favorite movie IDs (None if there is no metadata stored), in the order they were added.
+        """
+
+        favorites, _ = await self.get_user_favorites_page(user_id, 0, None)
+        return favorites
+
+    @_timed
+    async def get_user_favorites_page(
+        self, user_id: int, offset: int, limit: int | None
+    ) -> tuple[dict[int, MovieMeta | None], int]:
+        """
+        Get a range of the favorite movies of a user with their metadata, and the total number of favorites,
+        in one round trip. Only the requested range is read, so the cost does not depend on the list size
+
+        Parameters
+        ----------
+        user_id : int
+            The Telegram ID of the user.
+        offset : int
+            The position of the first movie to get.
+        limit : int | None
+            The maximum number of movies to get, None for all the rest.
+
+        Returns
+        -------
+        tuple[dict[int, MovieMeta | None], int]
+            Metadata by favorite movie IDs (None if there is no metadata stored), in the order they were added,
+            and the total number of the user's favorites.
+        """
+
+        stop = -1 if limit is None else offset + limit - 1
+        total, *page = await self._get_favorites_meta_script(
+            keys=[self._key(user_id), self.META_KEY], args=[offset, stop]
+        )
+        if not page:
+            return {}, total
+
+        movie_ids, metas = page
+        favorites = {
+            int(movie_id): MovieMeta.from_json(int(movie_id), meta) if meta else None
+            for movie_id, meta in zip(movie_ids, metas)
+        }
+        return favorites, total
+
+    @_timed
+    async def set_movies_meta(self, metas: list[MovieMeta]):
+        """
+        Store metadata of movies
+
+        Parameters
+        ----------
+        metas : list[MovieMeta]
+            The metadata to store.
+        """
+
+        if metas:
+            await self.r.hset(
+                self.META_KEY, mapping={meta.movie_id: meta.to_json() for meta in metas}
+            )
+
+    @_timed
+    async def update_movies_in_user(self, user_id: int, action: str, movie_id: int):
+        """
+        Update a user's favorite movies list. Both actions are a single atomic Redis command
 
         Parameters
         ----------
@@ -87,17 +334,15 @@ class FavoritesRedis:
             The ID of the movie to add or remove
         """
 
-        current_favorites = self.get_user_movies(user_id)
-
-        if action == "add" and movie_id not in current_favorites:
-            current_favorites.append(movie_id)
+        if action == "add":
+            # NX keeps the original position of a movie that is already in the list
+            await self.r.zadd(self._key(user_id), {movie_id: time.time()}, nx=True)
 
-        elif action == "remove" and movie_id in current_favorites:
-            current_favorites.remove(movie_id)
-        
-        self._set_user_movies(user_id, current_favorites)
+        elif action == "remove":
+            await self.r.zrem(self._key(user_id), movie_id)
 
-    def new_user(self, user_id: int):
+    @_timed
+    async def new_user(self, user_id: int):
         """
         Create a new user with an empty movies list (on /start command)
 
@@ -107,9 +352,11 @@ class FavoritesRedis:
             The Telegram ID of the user.
         """
         
-        self._set_user_movies(user_id, [])
+        # an empty sorted set does not exist in Redis, so removing the key is enough
+        await self.r.delete(self._key(user_id), user_id)
     
-    def clear_user_movies(self, user_id: int):
+    @_timed
+    async def clear_user_movies(self, user_id: int):
         """
         Clear a user's favorite movies list. Uses the new_user method.
 
@@ -119,4 +366,249 @@ class FavoritesRedis:
             The Telegram ID of the user.
         """
         
-        self.new_user(user_id)
\ No newline at end of file
+        await self.new_user(user_id)
+
+    @_timed
+    async def migrate_legacy_user(self, user_id: int) -> int:
+        """
+        Move a user's favorites from the legacy JSON list (stored under the bare user ID) to the sorted set.
+        The order of the movies is kept. Atomic and safe to run several times
+
+        Parameters
+        ----------
+        user_id : int
+            The Telegram ID of the user.
+
+        Returns
+        -------
+        int
+            The number of migrated movies (0 if there was nothing to migrate).
+        """
+
+        return await self._migrate_script(keys=[str(user_id), self._key(user_id)])
+
+    @_timed
+    async def migrate_legacy_favorites(self) -> int:
+        """
+        Move all users' favorites from legacy JSON lists to sorted sets (see `migrate_legacy_user`).
+        The keys are scanned only until a migration completes: then `MIGRATED_KEY` is set and later calls return at once
+
+        Returns
+        -------
+        int
+            The number of users whose favorites were migrated.
+        """
+
+        if await self.r.exists(self.MIGRATED_KEY):
+            return 0
+
+        migrated = 0
+        async for key in self.r.scan_iter(match="[1-9]*", _type="STRING"):
+            if key.isdigit() and await self.migrate_legacy_user(int(key)) > 0:
+                migrated += 1
+
+        await self.r.set(self.MIGRATED_KEY, int(time.time()))
+        return migrated
+
+
+class PosterFileIds:
+    """
+    Class to keep Telegram file IDs of already sent movie posters in Redis.
+
+    Once a poster has been sent, Telegram can serve it from its own storage by file ID,
+    instead of downloading it from TMDB again. The IDs are stored in one Redis hash
+    keyed by the poster path, and the recently used ones are memoized in process.
+
+    Methods
+    -------
+    get(poster_path) -> str | None
+        Get the file ID of a poster
+    get_many(poster_paths) -> list[str | None]
+        Get the file IDs of several posters
+    set_many(file_ids)
+        Remember the file IDs of sent posters
+    forget(poster_path)
+        Forget the file ID of a poster (if Telegram rejected it)
+    """
+
+    KEY = "poster_file_ids"
+
+    def __init__(self, r: StrictRedis, memo_size: int = 4096, memo_ttl: int = 24 * 60 * 60):
+        """
+        Parameters
+        ----------
+        r : StrictRedis
+            The async Redis client (with `decode_responses=True`), usually `FavoritesRedis.r`.
+        memo_size : int, optional
+            The maximum number of file IDs memoized in process. Default is 4096.
+        memo_ttl : int, optional
+            Seconds a file ID is memoized for, so one forgotten by another replica is dropped eventually.
+            Default is 1 day.
+        """
+
+        self.r = r
+        self.memo_ttl = memo_ttl
+        self._memo = TTLCache(max_size=memo_size)
+
+    async def get(self, poster_path: str) -> str | None:
+        """
+        Get the file ID of a poster
+
+        Parameters
+        ----------
+        poster_path : str
+            The TMDB path of the poster.
+
+        Returns
+        -------
+        str | None
+            The Telegram file ID, or None if the poster has not been sent yet.
+        """
+
+        return (await self.get_many([poster_path]))[0]
+
+    async def get_many(self, poster_paths: list[str]) -> list[str | None]:
+        """
+        Get the file IDs of several posters (in one Redis round trip at most)
+
+        Parameters
+        ----------
+        poster_paths : list[str]
+            The TMDB paths of the posters.
+
+        Returns
+        -------
+        list[str | None]
+            The Telegram file IDs, None for the posters not sent yet.
+        """
+
+        file_ids = [self._memo.get(path) for path in poster_paths]
+
+        missing = [i for i, file_id in enumerate(file_ids) if file_id is None]
+        if missing:
+            stored = await self.r.hmget(self.KEY, [poster_paths[i] for i in missing])
+            for i, file_id in zip(missing, stored):
+                if file_id:
+                    file_ids[i] = file_id
+                    self._memo.set(poster_paths[i], file_id, self.memo_ttl)
+
+        return file_ids
+
+    async def set_many(self, file_ids: dict[str, str]):
+        """
+        Remember the file IDs of sent posters
+
+        Parameters
+        ----------
+        file_ids : dict[str, str]
+            Telegram file IDs by TMDB poster paths.
+        """
+
+        new = {
+            path: file_id
+            for path, file_id in file_ids.items()
+            if self._memo.get(path) != file_id
+        }
+        if new:
+            await self.r.hset(self.KEY, mapping=new)
+            for path, file_id in new.items():
+                self._memo.set(path, file_id, self.memo_ttl)
+
+    async def forget(self, poster_path: str):
+        """
+        Forget the file ID of a poster (if Telegram rejected it)
+
+        Parameters
+        ----------
+        poster_path : str
+            The TMDB path of the poster.
+        """
+
+        self._memo.delete(poster_path)
+        await self.r.hdel(self.KEY, poster_path)
+
+
+class SearchResults:
+    """
+    Class to keep search results for a short time, so "Show more results" is served without TMDB calls.
+
+    Results are stored in Redis (so any replica can serve them), packed with `Movie.pack_many`, under a short random
+    token, which fits in callback data however many results there are, and memoized in process.
+
+    Methods
+    -------
+    put(movies) -> str
+        Store search results
+    get(token) -> list[Movie] | None
+        Get stored search results
+    """
+
+    KEY_PREFIX = "search_results:"
+
+    def __init__(self, r: StrictRedis, ttl: int = 60 * 60, memo_size: int = 1024):
+        """
+        Parameters
+        ----------
+        r : StrictRedis
+            The async binary Redis client (with `decode_responses=False`), usually `FavoritesRedis.raw`.
+        ttl : int, optional
+            Seconds the results are kept for. Default is 1 hour.
+        memo_size : int, optional
+            The maximum number of results lists memoized in process. Default is 1024.
+        """
+
+        self.r = r
+        self.ttl = ttl
+        self._memo = TTLCache(max_size=memo_size)
+
+    async def put(self, movies: list[Movie]) -> str:
+        """
+        Store search results
+
+        Parameters
+        ----------
+        movies : list[Movie]
+            The search results.
+
+        Returns
+        -------
+        str
+            The token to get the results by.
+        """
+
+        token = secrets.token_urlsafe(6)
+        await self.r.set(self.KEY_PREFIX + token, Movie.pack_many(movies), ex=self.ttl)
+        self._memo.set(token, movies, self.ttl)
+
+        return token
+
+    async def get(self, token: str) -> list[Movie] | None:
+        """
+        Get stored search results
+
+        Parameters
+        ----------
+        token : str
+            The token returned by `put`.
+
+        Returns
+        -------
+        list[Movie] | None
+            The search results, or None if they have expired (or are stored in an unsupported format).
+        """
+
+        movies = self._memo.get(token)
+        if movies is not None:
+            return movies
+
+        raw = await self.r.get(self.KEY_PREFIX + token)
+        if raw is None:
+            return None
+
+        try:
+            movies = Movie.unpack_many(raw)
+        except ValueError:
+            return None
+        self._memo.set(token, movies, self.ttl)
+
+        return movies
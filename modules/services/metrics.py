@@ -0,0 +1,230 @@
+import bisect
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+
+# Latency buckets in seconds, from a cached lookup to a slow TMDB call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Class representing a Prometheus counter with labels
+
+    Methods
+    -------
+    inc(*labels, amount)
+        Increase the counter
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Class representing a Prometheus histogram with labels
+
+    Recording is cheap: a binary search over the buckets and two additions.
+
+    Methods
+    -------
+    observe(*labels, value)
+        Record a value
+    time(*labels)
+        Context manager recording the seconds its block took
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # per labels: counts per bucket (the last one is +Inf, not cumulative), sum of values
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, *labels: str, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Class representing a Prometheus gauge read from a function when the metrics are collected
+    """
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.function()}",
+        ]
+
+
+class Registry:
+    """
+    Class collecting metrics to expose them in the Prometheus text format
+
+    Methods
+    -------
+    register(metric)
+        Add a metric
+    render() -> str
+        Render all the metrics
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def register(self, metric: Counter | Histogram | Gauge):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning("Metric %s collection failed: %r", metric.name, e)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(
+    Histogram("bot_handler_seconds", "Time taken by update handlers", ("event", "handler"))
+)
+HANDLER_ERRORS = REGISTRY.register(
+    Counter("bot_handler_errors_total", "Update handlers that raised an exception", ("event", "handler"))
+)
+TMDB_LATENCY = REGISTRY.register(
+    Histogram("tmdb_request_seconds", "Time taken by TMDB HTTP requests", ("endpoint",))
+)
+TMDB_ERRORS = REGISTRY.register(
+    Counter("tmdb_request_errors_total", "TMDB HTTP requests that failed or were not OK", ("endpoint",))
+)
+REDIS_LATENCY = REGISTRY.register(
+    Histogram("redis_operation_seconds", "Time taken by favorites database operations", ("operation",))
+)
+
+_ID_PATTERN = re.compile(r"/\d+")
+
+
+def endpoint_label(endpoint: str) -> str:
+    """
+    Get the label of a TMDB endpoint, with IDs replaced, so the number of labels stays bounded
+
+    Parameters
+    ----------
+    endpoint : str
+        The endpoint, e.g. "/movie/550/videos".
+
+    Returns
+    -------
+    str
+        The label, e.g. "/movie/{id}/videos".
+    """
+
+    return _ID_PATTERN.sub("/{id}", endpoint)
+
+
+class MetricsServer:
+    """
+    Class serving the metrics in the Prometheus text format on `http://<host>:<port>/metrics`
+
+    Methods
+    -------
+    start()
+        Start serving
+    close()
+        Stop serving
+    """
+
+    def __init__(self, registry: Registry = REGISTRY, host: str = "127.0.0.1", port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle)
+        self._runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain")
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
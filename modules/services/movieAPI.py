@@ -1,19 +1,44 @@
-import requests
+import asyncio
+import logging
+import re
+import time
+from typing import Awaitable
+
+import aiohttp
+from modules.services.cache import TTLCache, RedisMovieCache
+from modules.services.coalescing import SingleFlight
+from modules.services.metrics import TMDB_ERRORS, TMDB_LATENCY, endpoint_label
 from modules.types.common import Movie
 
 
+logger = logging.getLogger(__name__)
+
+
 class MovieAPI:
     """
     Class for interacting with The Movie Database API.
 
     This class handles HTTP requests to the TMDB API and returns movie information.
+    All requests go through one shared, connection-pooled `aiohttp` session with keep-alive,
+    so TMDB calls never block the event loop. Per-movie lookups are fanned out concurrently,
+    with the number of simultaneous TMDB requests capped by `concurrency`.
+
+    Successful responses are kept in an in-memory TTL+LRU cache, with a time to live
+    depending on the endpoint (see `CACHE_POLICIES`). Optionally, hydrated movies and search
+    results are also shared between bot replicas through a `RedisMovieCache`.
+    Identical requests made while one is already in flight share its response.
 
     Attributes
     ----------
     BASE_URL : str
         The base URL for the TMDB API.
+    CACHE_POLICIES : list[tuple[re.Pattern, float]]
+        Time to live (in seconds) of cached responses for endpoints matching the patterns.
+        Endpoints that match none of them are not cached.
     headers : dict
         The headers for the HTTP request.
+    cache : TTLCache
+        The cache of TMDB responses.
 
     Methods
     -------
@@ -25,12 +50,39 @@ class MovieAPI:
 
     get_trailer_url(movie_id) -> str | None
         Finds and returns a YouTube URL for a movie trailer in default language (if any) or in English.
+
+    get_movie(movie_id) -> Movie
+        Returns a Movie object (with trailer) for the specified TMDB ID in a single request.
+
+    resolve_trailers(movies) -> list[Movie]
+        Looks up the trailers of the movies that don't have them resolved yet.
+
+    close()
+        Closes the underlying HTTP session.
     """
 
     BASE_URL = "https://api.themoviedb.org/3"
     LANGUAGE = "uk-UA"
-
-    def __init__(self, access_token: str):
+    FALLBACK_LANGUAGE = "en-US"
+
+    CACHE_POLICIES = [
+        (re.compile(r"^/trending/"), 60 * 60),
+        (re.compile(r"^/search/"), 10 * 60),
+        (re.compile(r"^/movie/\d+$"), 3 * 24 * 60 * 60),
+        (re.compile(r"^/movie/\d+/videos$"), 3 * 24 * 60 * 60),
+    ]
+
+    def __init__(
+        self,
+        access_token: str,
+        pool_limit: int = 20,
+        pool_limit_per_host: int = 10,
+        timeout: float = 10,
+        keepalive_timeout: float = 30,
+        concurrency: int = 8,
+        cache_size: int = 2048,
+        shared_cache: RedisMovieCache | None = None,
+    ):
         """
         Initialize the MovieAPI class.
 
@@ -38,13 +90,69 @@ class MovieAPI:
         ----------
         access_token : str
             The access token for the TMDB API.
+        pool_limit : int, optional
+            The maximum number of simultaneous connections in the pool. Default is 20.
+        pool_limit_per_host : int, optional
+            The maximum number of simultaneous connections to one host. Default is 10.
+        timeout : float, optional
+            The total timeout of one request in seconds. Default is 10.
+        keepalive_timeout : float, optional
+            How long an idle connection is kept alive in seconds. Default is 30.
+        concurrency : int, optional
+            The maximum number of TMDB requests in flight at once. Default is 8.
+        cache_size : int, optional
+            The maximum number of cached responses, 0 disables the cache. Default is 2048.
+        shared_cache : RedisMovieCache | None, optional
+            The second cache level, shared between replicas. Default is None (not used).
         """
         self.headers = {
             "Authorization": "Bearer " + access_token,
             "Accept": "application/json",
         }
 
-    def api_call(self, endpoint: str, params: dict = {}) -> dict:
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.keepalive_timeout = keepalive_timeout
+
+        self._session: aiohttp.ClientSession | None = None
+        self._limiter = asyncio.Semaphore(concurrency)
+        self.cache = TTLCache(max_size=cache_size)
+        self.shared_cache = shared_cache
+        self._in_flight = SingleFlight()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The shared HTTP session. Created lazily, as it must be bound to a running event loop.
+        """
+
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+
+        return self._session
+
+    async def close(self):
+        """
+        Closes the underlying HTTP session. Call it once on shutdown.
+        """
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def api_call(
+        self, endpoint: str, params: dict = {}, refresh: bool = False
+    ) -> dict:
         """
         Makes an HTTP GET request to the TMDB API.
 
@@ -54,19 +162,101 @@ class MovieAPI:
             The endpoint of the TMDB API in the format "/<endpoint>".
         params : dict, optional
             The query parameters for the HTTP request.
+        refresh : bool, optional
+            If True, the cached response is ignored (and replaced with the new one). Default is False.
 
         Returns
         -------
         dict
-            The response from the TMDB API.
+            The response from the TMDB API. It may be shared with the cache, so it must not be modified.
+        """
+
+        ttl = self._cache_ttl(endpoint)
+        cache_key = self._cache_key(endpoint, params)
+        if ttl and not refresh:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        return await self._in_flight.do(
+            cache_key, lambda: self._request(endpoint, params, ttl)
+        )
+
+    async def _request(self, endpoint: str, params: dict, ttl: float | None) -> dict:
+        """
+        Sends the HTTP request and caches a successful response (internal). See `api_call`
         """
 
         url = self.BASE_URL + endpoint
-        response = requests.get(url, params, headers=self.headers)
+        label = endpoint_label(endpoint)
+        async with self._limiter:
+            start = time.perf_counter()
+            try:
+                async with self.session.get(url, params=params) as response:
+                    data = await response.json()
+            except Exception:
+                TMDB_ERRORS.inc(label)
+                raise
+            finally:
+                TMDB_LATENCY.observe(label, value=time.perf_counter() - start)
+
+        if not response.ok:
+            TMDB_ERRORS.inc(label)
+
+        if ttl and response.ok:
+            self.cache.set(self._cache_key(endpoint, params), data, ttl)
+
+        return data
+
+    @staticmethod
+    def _cache_key(endpoint: str, params: dict) -> tuple:
+        """
+        Returns the in-memory cache key of a request (internal)
+        """
+
+        return (endpoint, tuple(sorted(params.items())))
+
+    def _cache_ttl(self, endpoint: str) -> float | None:
+        """
+        Returns the cache time to live for the endpoint, or None if it is not cached (internal)
+        """
+
+        for pattern, ttl in self.CACHE_POLICIES:
+            if pattern.match(endpoint):
+                return ttl
+
+        return None
+
+    @staticmethod
+    async def _gather(tasks: list[Awaitable]) -> list:
+        """
+        Runs the awaitables concurrently and returns their results in the same order (internal).
+
+        A failed awaitable does not affect the others: its result is replaced with None. So is the result
+        of a cancelled one (its call may be shared and cancelled by its other callers, see `SingleFlight`).
+
+        Parameters
+        ----------
+        tasks : list[Awaitable]
+            The awaitables to run.
+
+        Returns
+        -------
+        list
+            The results, with None in place of the failed ones.
+        """
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for i, result in enumerate(results):
+            # a cancelled awaitable gives a CancelledError, which is not an Exception
+            if isinstance(result, BaseException):
+                logger.warning("TMDB lookup failed: %r", result)
+                results[i] = None
 
-        return response.json()
+        return results
 
-    def search(self, query: str) -> list[Movie] | None:
+    async def search(self, query: str) -> list[Movie] | None:
         """
         Searches for a movie using the specified query and returns the best match.
 
@@ -81,27 +271,54 @@ class MovieAPI:
             The best match movie, or None if no results were found.
         """
 
-        search_results: list[dict] = self.api_call(
-            endpoint="/search/movie",
-            params={"query": query, "language": self.LANGUAGE},
+        endpoint, params = "/search/movie", {"query": query, "language": self.LANGUAGE}
+
+        if self.shared_cache is None or self._cache_key(endpoint, params) in self.cache:
+            return await self._search(endpoint, params)
+
+        return await self.shared_cache.get_or_load(
+            key=f"search:{self.LANGUAGE}:{query}",
+            loader=lambda refresh: self._search(endpoint, params, refresh),
+            # no results (None) are stored as an empty list
+            encode=lambda movies: Movie.pack_many(movies or []),
+            decode=lambda raw: Movie.unpack_many(raw) or None,
+        )
+
+    async def _search(
+        self, endpoint: str, params: dict, refresh: bool = False
+    ) -> list[Movie] | None:
+        """
+        Performs the search request and builds the results (internal). See `search`
+        """
+
+        search_results: list[dict] = (
+            await self.api_call(endpoint, params, refresh)
         )["results"]
 
         if not search_results:
             return None
 
-        movies = []
-        for movie_data in search_results[:6]:
-            # only first 6 results (1 shown immedeiately, 5 more on show_more_results button)
-            trailer_url = self.get_trailer_url(movie_data["id"])
-            movie_data["trailer_url"] = trailer_url
-            movies.append(Movie.from_api(movie_data))
+        # only first 6 results (1 shown immedeiately, 5 more on show_more_results button).
+        # Only the best match gets its trailer now: the others are hydrated (with trailers) when displayed.
+        # If the trailer lookup fails, the best match is shown without a trailer
+        best_data, *others_data = search_results[:6]
+        (trailer_url,) = await self._gather([self.get_trailer_url(best_data["id"])])
+        best_result = Movie.from_api({**best_data, "trailer_url": trailer_url})
 
-        return movies
+        return [best_result] + [
+            Movie.from_api({**movie_data, "trailer_url": None})
+            for movie_data in others_data
+        ]
 
-    def get_trending(self) -> list[Movie]:
+    async def get_trending(self, refresh: bool = False) -> list[Movie]:
         """
         Returns a list of currently trending movies.
 
+        Parameters
+        ----------
+        refresh : bool, optional
+            If True, the cached list is ignored. Default is False.
+
         Returns
         -------
         list[Movie]
@@ -111,55 +328,122 @@ class MovieAPI:
         # Limit is set to 7. Changing it, be sure to change the inline keyboard layout in TrendingInlineMarkup in modules/types/markup.py
         MAX_RESULTS = 7
 
-        trending = self.api_call(
-            endpoint="/trending/movie/week",
-            params={"language": self.LANGUAGE},
+        trending = (
+            await self.api_call(
+                endpoint="/trending/movie/week",
+                params={"language": self.LANGUAGE},
+                refresh=refresh,
+            )
         )["results"]
 
-        movies = []
-        for movie_data in trending[:MAX_RESULTS]:
-            trailer_url = self.get_trailer_url(movie_data["id"])
-            movie_data["trailer_url"] = trailer_url
-            movies.append(Movie.from_api(movie_data))
+        # trailers are not shown in the trending list, they are looked up when a movie is expanded
+        return [
+            Movie.from_api({**movie_data, "trailer_url": None})
+            for movie_data in trending[:MAX_RESULTS]
+        ]
+
+    def _video_languages(self) -> str:
+        """
+        Returns the `include_video_language` parameter value: default language and English (internal)
+        """
 
-        return movies
+        return f"{self.LANGUAGE[:2]},{self.FALLBACK_LANGUAGE[:2]}"
 
-    def get_trailer_url(self, movie_id: int) -> str | None:
+    def _pick_trailer(self, videos: list[dict]) -> str | None:
         """
-        Finds and returns a YouTube URL for a movie trailer in default language (if any) or in English.
+        Picks a YouTube trailer URL from TMDB videos of both default and English languages (internal).
+
+        Videos in default language are preferred; English ones are only used if there are none.
 
         Parameters
         ----------
-        movie_id : int
-            The TMDB ID of the movie.
+        videos : list[dict]
+            TMDB video entries.
 
         Returns
         -------
         str | None
             The YouTube URL for the movie trailer, or None if no trailer was found.
         """
-        videos = self.api_call(
-            endpoint=f"/movie/{movie_id}/videos",
-            params={"language": self.LANGUAGE},
-        )["results"]
 
-        if not videos:
+        default_videos = [
+            video for video in videos if video["iso_639_1"] == self.LANGUAGE[:2]
+        ]
+        if not default_videos:
             # if no trailer found in default language, try English
-            videos = self.api_call(
-                endpoint=f"/movie/{movie_id}/videos",
-                params={"language": "en-US"},
-            )["results"]
+            default_videos = [
+                video
+                for video in videos
+                if video["iso_639_1"] == self.FALLBACK_LANGUAGE[:2]
+            ]
 
-        for video in videos:
+        for video in default_videos:
             if video["type"] == "Trailer" and video["site"] == "YouTube":
                 return f"https://www.youtube.com/watch?v={video['key']}"
 
         return None
 
-    def get_movie(self, movie_id: int) -> Movie:
+    async def get_trailer_url(self, movie_id: int) -> str | None:
+        """
+        Finds and returns a YouTube URL for a movie trailer in default language (if any) or in English.
+
+        Videos in both languages are requested at once.
+
+        Parameters
+        ----------
+        movie_id : int
+            The TMDB ID of the movie.
+
+        Returns
+        -------
+        str | None
+            The YouTube URL for the movie trailer, or None if no trailer was found.
+        """
+        videos = (
+            await self.api_call(
+                endpoint=f"/movie/{movie_id}/videos",
+                params={
+                    "language": self.LANGUAGE,
+                    "include_video_language": self._video_languages(),
+                },
+            )
+        )["results"]
+
+        return self._pick_trailer(videos)
+
+    async def resolve_trailers(self, movies: list[Movie]) -> list[Movie]:
+        """
+        Looks up the trailers of the movies that don't have them resolved yet (built from search results),
+        concurrently. Movies whose lookup failed are left without a trailer.
+
+        Parameters
+        ----------
+        movies : list[Movie]
+            The movies.
+
+        Returns
+        -------
+        list[Movie]
+            The movies in the same order, the unresolved ones replaced with copies having their trailers set.
+        """
+
+        unresolved = [i for i, movie in enumerate(movies) if movie.trailer_url is None]
+        trailer_urls = await self._gather(
+            [self.get_trailer_url(movies[i].movie_id) for i in unresolved]
+        )
+
+        resolved = list(movies)
+        for i, trailer_url in zip(unresolved, trailer_urls):
+            resolved[i] = movies[i].with_trailer(trailer_url or "")
+
+        return resolved
+
+    async def get_movie(self, movie_id: int) -> Movie:
         """
         Returns a Movie object for the specified TMDB ID.
 
+        Details and videos (in default language and English) are fetched in a single request.
+
         Parameters
         ----------
         movie_id : int
@@ -170,14 +454,36 @@ class MovieAPI:
         Movie
             A Movie object for the specified TMDB ID.
         """
-        movie_data = self.api_call(
-            endpoint=f"/movie/{movie_id}", params={"language": self.LANGUAGE}
+        endpoint = f"/movie/{movie_id}"
+        params = {
+            "language": self.LANGUAGE,
+            "append_to_response": "videos",
+            "include_video_language": self._video_languages(),
+        }
+
+        if self.shared_cache is None or self._cache_key(endpoint, params) in self.cache:
+            return await self._get_movie(endpoint, params)
+
+        return await self.shared_cache.get_or_load(
+            key=f"movie:{self.LANGUAGE}:{movie_id}",
+            loader=lambda refresh: self._get_movie(endpoint, params, refresh),
+            encode=Movie.to_bytes,
+            decode=Movie.from_bytes,
         )
-        movie_data["trailer_url"] = self.get_trailer_url(movie_id)
 
-        return Movie.from_api(movie_data)
+    async def _get_movie(
+        self, endpoint: str, params: dict, refresh: bool = False
+    ) -> Movie:
+        """
+        Performs the movie details request and builds the Movie object (internal). See `get_movie`
+        """
+
+        movie_data = await self.api_call(endpoint, params, refresh)
+        trailer_url = self._pick_trailer(movie_data["videos"]["results"])
+
+        return Movie.from_api({**movie_data, "trailer_url": trailer_url})
 
-    def movie_factory(self, movie_ids: list[int]) -> list[Movie]:
+    async def movie_factory(self, movie_ids: list[int]) -> list[Movie]:
         """
         Returns a list of Movie objects for the specified list of TMDB IDs.
 
@@ -189,6 +495,9 @@ class MovieAPI:
         Returns
         -------
         list[Movie]
-            A list of Movie objects for the specified list of TMDB IDs.
+            A list of Movie objects for the specified list of TMDB IDs, in the same order.
+            Movies that failed to load are left out.
         """
-        return [self.get_movie(movie_id) for movie_id in movie_ids]
+        movies = await self._gather([self.get_movie(movie_id) for movie_id in movie_ids])
+
+        return [movie for movie in movies if movie is not None]
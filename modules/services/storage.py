@@ -0,0 +1,72 @@
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from modules.services.cache import TTLCache
+
+
+class TTLMemoryStorage(BaseStorage):
+    """
+    In-memory FSM storage with a time to live and a cap on the number of records.
+
+    Unlike aiogram's `MemoryStorage`, records don't live forever: a record is dropped `ttl` seconds
+    after it was last written, and once there are `max_size` records, the least recently used one is dropped.
+    Records without state and data are not kept at all. So the memory taken stays flat however long the bot runs.
+
+    Methods
+    -------
+    set_state(key, state)
+        Set the state of a user in a chat
+    get_state(key) -> str | None
+        Get the state of a user in a chat
+    set_data(key, data)
+        Set the data of a user in a chat
+    get_data(key) -> dict
+        Get the data of a user in a chat
+    close()
+        Drop all the records
+    """
+
+    def __init__(self, ttl: float = 24 * 60 * 60, max_size: int = 10000):
+        """
+        Parameters
+        ----------
+        ttl : float, optional
+            Seconds after the last write a record is kept for. Default is 1 day.
+        max_size : int, optional
+            The maximum number of records kept. Default is 10000.
+        """
+
+        self.ttl = ttl
+        self.records = TTLCache(max_size)
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        state = state.state if isinstance(state, State) else state
+        _, data = self.records.get(key, (None, {}))
+        self._store(key, state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = self.records.get(key, (None, {}))
+        return state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]):
+        state, _ = self.records.get(key, (None, {}))
+        self._store(key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = self.records.get(key, (None, {}))
+        return data.copy()
+
+    async def close(self):
+        self.records.clear()
+
+    def _store(self, key: StorageKey, state: str | None, data: dict[str, Any]):
+        """
+        Write a record, or drop it if it is empty (internal)
+        """
+
+        if state is None and not data:
+            self.records.delete(key)
+        else:
+            self.records.set(key, (state, data), self.ttl)
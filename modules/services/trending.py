@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+from modules.services.movieAPI import MovieAPI
+from modules.types.common import Movie
+from modules.types.markup import TrendingInlineMarkup
+
+
+logger = logging.getLogger(__name__)
+
+
+class TrendingService:
+    """
+    Class keeping the list of trending movies ready to be sent.
+
+    The list is refreshed in background on an interval (see `run`), so answering `/trending`
+    takes no TMDB calls at all.
+
+    Attributes
+    ----------
+    movies : list[Movie]
+        The trending movies
+    text : str
+        The brief info of the trending movies, rendered for Telegram
+    markup : TrendingInlineMarkup
+        The inline keyboard with the trending movies
+
+    Methods
+    -------
+    refresh()
+        Fetch the trending movies and render the message parts
+    ensure_ready()
+        Make sure the trending movies are loaded (on the first request, if the background refresh is late)
+    run()
+        Refresh the trending movies forever, every `interval` seconds
+    """
+
+    def __init__(self, movie_api: MovieAPI, interval: float = 60 * 60):
+        """
+        Parameters
+        ----------
+        movie_api : MovieAPI
+            The TMDB API client.
+        interval : float, optional
+            Seconds between refreshes. Default is 1 hour.
+        """
+
+        self.movie_api = movie_api
+        self.interval = interval
+
+        self.movies: list[Movie] = []
+        self.text = ""
+        self.markup: TrendingInlineMarkup | None = None
+
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.markup is not None
+
+    async def refresh(self):
+        """
+        Fetch the trending movies and render the message parts
+        """
+
+        async with self._lock:
+            await self._refresh()
+
+    async def ensure_ready(self):
+        """
+        Make sure the trending movies are loaded (on the first request, if the background refresh is late)
+        """
+
+        if self.ready:
+            return
+
+        async with self._lock:
+            # another request may have loaded the movies while we were waiting for the lock
+            if not self.ready:
+                await self._refresh()
+
+    async def _refresh(self):
+        """
+        Fetch the trending movies and render the message parts (internal, must be called under the lock)
+        """
+
+        movies = await self.movie_api.get_trending(refresh=True)
+
+        text = ""
+        for i, movie in enumerate(movies):
+            text += f"<b>{i + 1}.</b> {movie.text_brief}\n"
+
+        markup = TrendingInlineMarkup(movies)
+
+        # swap all the parts at once, so a reader never sees a mix of old and new ones
+        self.movies, self.text, self.markup = movies, text, markup
+
+    async def run(self):
+        """
+        Refresh the trending movies forever, every `interval` seconds. Meant to be run as a background task
+        """
+
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.exception("Trending movies refresh failed: %r", e)
+
+            await asyncio.sleep(self.interval)
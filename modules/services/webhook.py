@@ -0,0 +1,163 @@
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from modules.services.workers import WorkerPool
+
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """
+    Class receiving Telegram updates by webhook with an embedded `aiohttp` server.
+
+    Each update is answered with 200 right away and processed by the `Dispatcher` in background,
+    with at most `concurrency` updates processed at once. When all the slots are taken,
+    new requests wait for one, so Telegram slows down instead of updates piling up in memory.
+
+    With a `WorkerPool`, updates are routed to its worker processes instead.
+
+    Requests without the right `X-Telegram-Bot-Api-Secret-Token` header are rejected with 403.
+    Updates can be tested locally by POSTing their JSON to `http://<host>:<port><path>`.
+
+    Methods
+    -------
+    handle(request)
+        Handle a webhook request
+    run()
+        Register the webhook (if a URL is given) and serve until cancelled
+    """
+
+    SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        path: str = "/webhook",
+        url: str = "",
+        secret_token: str = "",
+        concurrency: int = 100,
+        pool: WorkerPool | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        dp : Dispatcher
+            The dispatcher to feed updates to.
+        bot : Bot
+            The bot the updates are for.
+        host : str, optional
+            The interface to listen on. Default is "0.0.0.0".
+        port : int, optional
+            The port to listen on. Default is 8080.
+        path : str, optional
+            The path of the webhook endpoint. Default is "/webhook".
+        url : str, optional
+            The public URL of the endpoint to register with Telegram. If empty, the webhook is not registered
+            (for local testing, or when it is registered some other way). Default is "".
+        secret_token : str, optional
+            The secret token Telegram sends with every update. If empty, requests are not checked. Default is "".
+        concurrency : int, optional
+            Maximum number of updates processed at once. Default is 100.
+        pool : WorkerPool | None, optional
+            The pool of worker processes to route updates to, instead of processing them here. Default is None.
+        """
+
+        self.dp = dp
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.path = path
+        self.url = url
+        self.secret_token = secret_token
+        self.pool = pool
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: set[asyncio.Task] = set()
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """
+        Handle a webhook request: check the secret token and start processing the update
+
+        Parameters
+        ----------
+        request : web.Request
+            The request from Telegram.
+
+        Returns
+        -------
+        web.Response
+            200 if the update was accepted, 403 on a wrong secret token, 400 on a malformed update.
+        """
+
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(self.SECRET_HEADER, ""), self.secret_token
+        ):
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            if self.pool is not None:
+                self.pool.dispatch(data)
+                return web.Response()
+
+            update = Update.model_validate(data, context={"bot": self.bot})
+        except (ValueError, TypeError, AttributeError):
+            return web.Response(status=400)
+
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        # keep a reference, so the task is not garbage collected before it is done
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return web.Response()
+
+    async def _process(self, update: Update):
+        """
+        Feed an update to the dispatcher (internal, releases the slot taken in `handle`)
+        """
+
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.exception("Update %d processing failed: %r", update.update_id, e)
+        finally:
+            self._slots.release()
+
+    async def run(self):
+        """
+        Register the webhook (if a URL is given) and serve until cancelled.
+        On exit, the server stops accepting updates and waits for the ones in progress
+        """
+
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        logger.info("Listening for updates on %s:%d%s", self.host, self.port, self.path)
+
+        if self.url:
+            await self.bot.set_webhook(
+                self.url,
+                secret_token=self.secret_token or None,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+
+logger = logging.getLogger(__name__)
+
+
+def shard_key(data: dict) -> int:
+    """
+    Get the key an update is routed by: the ID of the user who sent it, or of the chat it came from
+
+    Parameters
+    ----------
+    data : dict
+        The update, as received from Telegram.
+
+    Returns
+    -------
+    int
+        The user or chat ID, 0 if the update has neither.
+    """
+
+    for name, event in data.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+
+        if "from" in event:
+            return event["from"]["id"]
+        if "user" in event:
+            return event["user"]["id"]
+        if "chat" in event:
+            return event["chat"]["id"]
+        if "message" in event:
+            return event["message"]["chat"]["id"]
+
+    return 0
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Map a key to one of the buckets with the jump consistent hash (Lamping, Veach), so when the number
+    of buckets changes only a minimal share of keys moves to other buckets
+
+    Parameters
+    ----------
+    key : int
+        The key.
+    buckets : int
+        The number of buckets.
+
+    Returns
+    -------
+    int
+        The bucket of the key, from 0 to `buckets` - 1.
+    """
+
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, j = -1, 0
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+
+    return bucket
+
+
+class WorkerPool:
+    """
+    Class running the bot in several worker processes, with updates routed to them from the front process.
+
+    Every update goes to a worker chosen by a consistent hash of its user (or chat) ID, so all updates
+    of a user are handled by the same worker, in the order they were received. This also keeps the
+    user's FSM state in one process.
+
+    Methods
+    -------
+    start()
+        Start the worker processes
+    dispatch(data)
+        Route an update to its worker
+    poll(bot, allowed_updates)
+        Receive updates by long polling and route them to the workers
+    close()
+        Stop the worker processes after they handle the updates already routed to them
+    """
+
+    def __init__(self, workers: int, target):
+        """
+        Parameters
+        ----------
+        workers : int
+            The number of worker processes.
+        target : Callable[[multiprocessing.Queue, int], None]
+            A top-level function (or a `functools.partial` of one) run in every worker process with the queue
+            of its updates and the worker number.
+            It should pass the queue to `UpdateWorker` along with the worker's own `Dispatcher`.
+        """
+
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue() for _ in range(workers)]
+        self.processes = [
+            context.Process(target=target, args=(queue, i), name=f"worker-{i}", daemon=True)
+            for i, queue in enumerate(self.queues)
+        ]
+
+    def start(self):
+        """
+        Start the worker processes
+        """
+
+        for process in self.processes:
+            process.start()
+
+    def dispatch(self, data: dict):
+        """
+        Route an update to its worker
+
+        Parameters
+        ----------
+        data : dict
+            The update, as received from Telegram.
+        """
+
+        key = shard_key(data)
+        self.queues[jump_hash(key, len(self.queues))].put((key, data))
+
+    async def poll(self, bot: Bot, allowed_updates: list[str] | None = None, timeout: int = 30):
+        """
+        Receive updates by long polling and route them to the workers, until cancelled
+
+        Parameters
+        ----------
+        bot : Bot
+            The bot to receive updates for.
+        allowed_updates : list[str] | None, optional
+            The types of updates to receive. Default is None (the types Telegram sends by default).
+        timeout : int, optional
+            Seconds a `getUpdates` request waits for updates. Default is 30.
+        """
+
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=timeout, allowed_updates=allowed_updates
+                )
+            except Exception as e:
+                logger.error("Failed to get updates: %r", e)
+                await asyncio.sleep(1)
+                continue
+
+            for update in updates:
+                # by alias, so the update is in the format Telegram sends (`from`, not `from_user`)
+                self.dispatch(
+                    update.model_dump(mode="json", by_alias=True, exclude_unset=True, exclude_none=True)
+                )
+                offset = update.update_id + 1
+
+    async def close(self):
+        """
+        Stop the worker processes after they handle the updates already routed to them
+        """
+
+        for queue in self.queues:
+            queue.put(None)
+
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+
+
+class UpdateWorker:
+    """
+    Class feeding updates routed by a `WorkerPool` to the `Dispatcher` of a worker process.
+
+    Updates of different users are processed concurrently, at most `concurrency` at once,
+    while updates of one user are processed one by one, in the order they were received.
+    The updates waiting for the previous ones of their user don't take a slot, so a user sending many updates
+    doesn't hold up the others. At most `max_pending` updates are buffered (waiting or in progress) at once.
+
+    Methods
+    -------
+    run()
+        Process updates until the pool is closed
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        queue: multiprocessing.Queue,
+        concurrency: int = 100,
+        max_pending: int = 1000,
+    ):
+        """
+        Parameters
+        ----------
+        dp : Dispatcher
+            The dispatcher to feed updates to.
+        bot : Bot
+            The bot the updates are for.
+        queue : multiprocessing.Queue
+            The queue of updates routed to this worker.
+        concurrency : int, optional
+            Maximum number of updates processed at once. Default is 100.
+        max_pending : int, optional
+            Maximum number of updates taken from the queue and not processed yet. Default is 1000.
+        """
+
+        self.dp = dp
+        self.bot = bot
+        self.queue = queue
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._tasks: set[asyncio.Task] = set()
+        # updates of every user with updates in progress, in order. Each user has a task processing them
+        self._users: dict[int, deque[Update]] = {}
+
+    async def run(self):
+        """
+        Process updates until the pool is closed, then wait for the ones in progress
+        """
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await loop.run_in_executor(None, self.queue.get)
+            if item is None:
+                break
+
+            key, data = item
+            try:
+                update = Update.model_validate(data, context={"bot": self.bot})
+            except ValueError as e:
+                logger.error("Malformed update dropped: %r", e)
+                continue
+
+            await self._pending.acquire()
+
+            updates = self._users.get(key)
+            if updates is not None:
+                # the user's task takes it after the previous ones
+                updates.append(update)
+                continue
+
+            self._users[key] = deque([update])
+            task = asyncio.create_task(self._process_user(key))
+            # keep a reference, so the task is not garbage collected before it is done
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _process_user(self, key: int):
+        """
+        Feed the updates of a user to the dispatcher one by one, until there are none left (internal).
+        A slot is taken for each update, only while it's being processed
+        """
+
+        updates = self._users[key]
+        try:
+            while updates:
+                update = updates.popleft()
+                try:
+                    async with self._slots:
+                        await self.dp.feed_update(self.bot, update)
+                except Exception as e:
+                    logger.exception("Update %d processing failed: %r", update.update_id, e)
+                finally:
+                    self._pending.release()
+        finally:
+            # no await between the last check and this, so `run` either appended before or sees no entry
+            del self._users[key]
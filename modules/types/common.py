@@ -1,8 +1,15 @@
 from aiogram.fsm.state import StatesGroup, State
-import yaml
+from functools import lru_cache
+from types import SimpleNamespace
+import json
+import os
+import struct
+import sys
+import time
+from typing import NamedTuple
 
 
-class Movie:
+class Movie(NamedTuple):
     """
     Class representing a movie
 
@@ -24,27 +31,20 @@ class Movie:
         The TMDB API path to the poster of the movie
     trailer_url: str
         The YouTube URL of the trailer of the movie
+
+    Instances are immutable named tuples (no per-object `__dict__`) and genre strings are interned, so the many
+    movies kept in caches and stores take little memory and can be shared safely. `to_bytes` (or `pack_many`
+    for a list) gives a compact binary form for the Redis stores.
     """
 
-    def __init__(
-        self,
-        movie_id: int,
-        title: str,
-        genres: str,
-        rating: float,
-        year: int,
-        overview: str,
-        poster_url: str,
-        trailer_url: str = "",
-    ):
-        self.movie_id = movie_id
-        self.title = title
-        self.genres = genres
-        self.rating = rating
-        self.year = year
-        self.overview = overview
-        self.poster_path = poster_url
-        self.trailer_url = trailer_url
+    movie_id: int
+    title: str
+    genres: str
+    rating: float
+    year: int
+    overview: str
+    poster_path: str
+    trailer_url: str = ""
 
     GENRES = {
         28: "Бойовик",
@@ -68,56 +68,54 @@ class Movie:
         37: "Вестерн",
     }
 
+    # genres strings built by `from_api`, by the genres they are built of (not annotated, as it's not a field)
+    _genres_strings = {}
+
+    # binary format: version, movie ID, rating and the byte lengths of the text fields, followed by the fields
+    BINARY_VERSION = 1
+    _BINARY_HEADER = struct.Struct("<BIdIIIIII")
+    # the length marking a text field that is None
+    _BINARY_NONE = 0xFFFFFFFF
+    # a list of movies: the number of movies, followed by the movies
+    _BINARY_COUNT = struct.Struct("<I")
+
     @property
     def text(self) -> str:
         """
         A formatted text representation of the movie for Telegram
 
+        Rendered from the `MOVIE_TEXT` template and memoized by the movie fields (see `_render_text`)
+
         Returns
         -------
         str
             A formatted text representation of the movie
         """
 
-        result = ""
-
-        result += f"🎬 <b>{self.title}</b>\n\n"
-
-        result += f"⭐️ {self.rating}\n" if self.rating != 0 else f"⭐️ Немає рейтингу\n"
-        result += f"🎭 {self.genres}\n"
-        result += f"📅 {self.year}\n\n"
-
-        if self.trailer_url:
-            result += f'🔗 <a href="{self.trailer_url}">Трейлер (YouTube)</a>\n'
-        if self.overview:
-            result += f"<blockquote expandable>{self.overview}</blockquote>\n\n"
-        else:
-            result += "<i>Немає опису</i>\n\n"
-
-        return result
+        return _render_text(
+            self.movie_id,
+            self.title,
+            self.rating,
+            self.genres,
+            self.year,
+            self.overview,
+            self.trailer_url,
+        )
 
     @property
     def text_brief(self) -> str:
         """
         A brief formatted text representation of the movie for Telegram
 
+        Rendered from the `MOVIE_TEXT_BRIEF` template and memoized by the movie fields (see `_render_text_brief`)
+
         Returns
         -------
         str
             A brief formatted text representation of the movie
         """
 
-        result = ""
-
-        result += f"🎬 <b>{self.title}</b>\n"
-        result += f"🎭 {self.genres}\n"
-
-        if self.overview:
-            result += f"<blockquote expandable>{self.overview}</blockquote>\n"
-        else:
-            result += "<i>Немає опису</i>\n"
-
-        return result
+        return _render_text_brief(self.movie_id, self.title, self.genres, self.overview)
 
     @classmethod
     def from_api(cls, data: dict):
@@ -136,12 +134,17 @@ class Movie:
         """
 
         if "genre_ids" in data:
-            genre_names = [cls.GENRES[genre_id] for genre_id in data["genre_ids"]]
+            genres_key = tuple(data["genre_ids"])
         elif "genres" in data:
-            genre_names = []
-            for genre in data["genres"]:
-                genre_names.append(genre["name"])
-        genres = ", ".join(genre_names).capitalize()
+            genres_key = tuple(genre["name"] for genre in data["genres"])
+
+        genres = cls._genres_strings.get(genres_key)
+        if genres is None:
+            genre_names = [
+                cls.GENRES[genre] if isinstance(genre, int) else genre for genre in genres_key
+            ]
+            genres = sys.intern(", ".join(genre_names).capitalize())
+            cls._genres_strings[genres_key] = genres
 
         if data["poster_path"] is not None:
             poster_url = f"https://image.tmdb.org/t/p/w500/{data['poster_path']}"
@@ -161,25 +164,409 @@ class Movie:
             data["trailer_url"],
         )
 
+    def to_dict(self) -> dict:
+        """
+        Returns a JSON-serializable representation of the movie, to be restored with `from_dict`
+
+        Returns
+        -------
+        dict
+            The movie fields keyed by the constructor argument names.
+        """
+
+        return {
+            "movie_id": self.movie_id,
+            "title": self.title,
+            "genres": self.genres,
+            "rating": self.rating,
+            "year": self.year,
+            "overview": self.overview,
+            "poster_url": self.poster_path,
+            "trailer_url": self.trailer_url,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+        Creates a Movie instance from the output of `to_dict`.
+
+        Parameters
+        ----------
+        data : dict
+            The movie fields keyed by the constructor argument names.
+
+        Returns
+        -------
+        Movie
+            A Movie instance.
+        """
+
+        genres = data["genres"]
+        if genres is not None:
+            genres = sys.intern(genres)
+
+        return cls(
+            data["movie_id"],
+            data["title"],
+            genres,
+            data["rating"],
+            data["year"],
+            data["overview"],
+            data["poster_url"],
+            data.get("trailer_url", ""),
+        )
+
+    def with_trailer(self, trailer_url: str):
+        """
+        Returns a copy of the movie with the trailer set
+
+        Parameters
+        ----------
+        trailer_url : str
+            The YouTube URL of the trailer, an empty string if there is none.
+
+        Returns
+        -------
+        Movie
+            A Movie instance.
+        """
+
+        return self._replace(trailer_url=trailer_url)
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns a compact binary representation of the movie, to be restored with `from_bytes`
+
+        Returns
+        -------
+        bytes
+            The movie ID and rating packed as numbers, followed by the UTF-8 text fields.
+        """
+
+        fields = (self.title, self.genres, self.year, self.overview, self.poster_path, self.trailer_url)
+        encoded = [b"" if field is None else str(field).encode() for field in fields]
+        lengths = [
+            self._BINARY_NONE if field is None else len(raw)
+            for field, raw in zip(fields, encoded)
+        ]
+
+        return self._BINARY_HEADER.pack(
+            self.BINARY_VERSION, self.movie_id, self.rating, *lengths
+        ) + b"".join(encoded)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes):
+        """
+        Creates a Movie instance from the output of `to_bytes`.
+
+        Parameters
+        ----------
+        raw : bytes
+            The binary representation of the movie.
+
+        Returns
+        -------
+        Movie
+            A Movie instance.
+
+        Raises
+        ------
+        ValueError
+            If the data is not a movie of the current format version.
+        """
+
+        return cls._read(raw, 0)[0]
+
+    @classmethod
+    def pack_many(cls, movies: list["Movie"]) -> bytes:
+        """
+        Returns a compact binary representation of a list of movies, to be restored with `unpack_many`
+
+        Parameters
+        ----------
+        movies : list[Movie]
+            The movies.
+
+        Returns
+        -------
+        bytes
+            The number of movies, followed by the movies (see `to_bytes`).
+        """
+
+        return cls._BINARY_COUNT.pack(len(movies)) + b"".join(movie.to_bytes() for movie in movies)
+
+    @classmethod
+    def unpack_many(cls, raw: bytes) -> list["Movie"]:
+        """
+        Creates a list of Movie instances from the output of `pack_many`.
+
+        Parameters
+        ----------
+        raw : bytes
+            The binary representation of the movies.
+
+        Returns
+        -------
+        list[Movie]
+            The movies.
+
+        Raises
+        ------
+        ValueError
+            If the data is not a list of movies of the current format version.
+        """
+
+        try:
+            (count,) = cls._BINARY_COUNT.unpack_from(raw)
+        except struct.error as e:
+            raise ValueError(f"Malformed Movie list: {e}") from None
+
+        movies = []
+        offset = cls._BINARY_COUNT.size
+        for _ in range(count):
+            movie, offset = cls._read(raw, offset)
+            movies.append(movie)
+
+        return movies
+
+    @classmethod
+    def _read(cls, raw: bytes, offset: int):
+        """
+        Reads a movie written by `to_bytes` at the offset, returns it with the offset following it (internal)
+        """
+
+        try:
+            version, movie_id, rating, *lengths = cls._BINARY_HEADER.unpack_from(raw, offset)
+        except struct.error as e:
+            raise ValueError(f"Malformed Movie: {e}") from None
+        if version != cls.BINARY_VERSION:
+            raise ValueError(f"Unsupported Movie binary format version: {version}")
+
+        fields = []
+        offset += cls._BINARY_HEADER.size
+        for length in lengths:
+            if length == cls._BINARY_NONE:
+                fields.append(None)
+            else:
+                if offset + length > len(raw):
+                    raise ValueError("Malformed Movie: truncated field")
+                fields.append(str(raw[offset : offset + length], "utf-8"))
+                offset += length
+
+        title, genres, year, overview, poster_path, trailer_url = fields
+        if genres is not None:
+            genres = sys.intern(genres)
+
+        movie = cls(movie_id, title, genres, rating, year, overview, poster_path, trailer_url)
+        return movie, offset
+
+class MovieMeta:
+    """
+    Class representing compact metadata of a movie, enough to list it without a TMDB call
+
+    Attributes
+    ------------
+    movie_id: int
+        The TMDB ID of the movie
+    title: str
+        The title of the movie
+    year: int
+        The year of release of the movie
+    poster_path: str
+        The TMDB API path to the poster of the movie
+    updated_at: float
+        The UNIX time the metadata was taken from TMDB
+    """
+
+    def __init__(
+        self,
+        movie_id: int,
+        title: str,
+        year: int,
+        poster_path: str,
+        updated_at: float,
+    ):
+        self.movie_id = movie_id
+        self.title = title
+        self.year = year
+        self.poster_path = poster_path
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_movie(cls, movie: Movie):
+        """
+        Creates a MovieMeta instance from a Movie.
+
+        Parameters
+        ----------
+        movie : Movie
+            The movie.
+
+        Returns
+        -------
+        MovieMeta
+            The metadata of the movie, taken now.
+        """
+
+        return cls(movie.movie_id, movie.title, movie.year, movie.poster_path, time.time())
+
+    def to_json(self) -> str:
+        """
+        Returns a compact JSON representation of the metadata, to be restored with `from_json`
+        """
+
+        return json.dumps(
+            [self.title, self.year, self.poster_path, self.updated_at],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, movie_id: int, raw: str):
+        """
+        Creates a MovieMeta instance from the output of `to_json`.
+
+        Parameters
+        ----------
+        movie_id : int
+            The TMDB ID of the movie.
+        raw : str
+            The JSON representation of the metadata.
+
+        Returns
+        -------
+        MovieMeta
+            A MovieMeta instance.
+        """
+
+        return cls(movie_id, *json.loads(raw))
+
 class MessageTemplates:
+    """
+    Class giving access to the message templates from `modules/messageTemplates.yaml` as attributes
+
+    Parsing YAML is slow, so the templates are compiled into a JSON file next to it (`.messageTemplates.json`),
+    which is rebuilt only when the YAML file's modification time changes.
+
+    Use the module-level `templates` instance. The templates are loaded on the first attribute access,
+    after which getting one is a plain attribute lookup. `MessageTemplates()` returns the same instance.
+    """
+
     _instance = None
-    _initialized = False
-    
+
     def __new__(cls, yaml_path="modules/messageTemplates.yaml"):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
+            cls._instance._yaml_path = yaml_path
         return cls._instance
-    
-    def __init__(self, yaml_path="modules/messageTemplates.yaml"):
-        # only initialize once
-        if not MessageTemplates._initialized:
-                
-            with open(yaml_path, 'r', encoding='utf-8') as file:
-                templates = yaml.safe_load(file)
-                for key, value in templates.items():
-                    setattr(self, key, value)
-            
-            MessageTemplates._initialized = True
+
+    def __getattr__(self, name: str):
+        # only called for missing attributes, that is, until the templates are loaded
+        if name.startswith("_") or "_loaded" in self.__dict__:
+            raise AttributeError(name)
+
+        self.__dict__.update(self._load())
+        self._loaded = True
+
+        return getattr(self, name)
+
+    def _compiled_path(self) -> str:
+        directory, file_name = os.path.split(self._yaml_path)
+        return os.path.join(directory, "." + os.path.splitext(file_name)[0] + ".json")
+
+    def _load(self) -> dict[str, str]:
+        """
+        Load the templates from the compiled file, compiling it first if it is missing or outdated (internal)
+        """
+
+        mtime = os.stat(self._yaml_path).st_mtime_ns
+        compiled_path = self._compiled_path()
+
+        try:
+            with open(compiled_path, "r", encoding="utf-8") as file:
+                compiled = json.load(file)
+            if compiled["mtime"] == mtime:
+                return compiled["templates"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # PyYAML is only imported when the templates have to be compiled
+        import yaml
+
+        with open(self._yaml_path, "r", encoding="utf-8") as file:
+            templates = yaml.safe_load(file)
+
+        try:
+            # write to a temporary file first, so other processes never read a partly written one
+            temporary_path = f"{compiled_path}.{os.getpid()}"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump({"mtime": mtime, "templates": templates}, file, ensure_ascii=False)
+            os.replace(temporary_path, compiled_path)
+        except OSError:
+            # read-only deployment: use the parsed templates without saving them
+            pass
+
+        return templates
+
+
+templates = MessageTemplates()
+
+
+@lru_cache(maxsize=None)
+def _movie_templates() -> SimpleNamespace:
+    """
+    The templates of movie texts, loaded from `templates` once and bound to `str.format` (internal)
+    """
+
+    return SimpleNamespace(
+        text=templates.MOVIE_TEXT.format,
+        text_brief=templates.MOVIE_TEXT_BRIEF.format,
+        no_rating=templates.MOVIE_NO_RATING,
+        trailer=templates.MOVIE_TRAILER.format,
+        overview=templates.MOVIE_OVERVIEW.format,
+        no_overview=templates.MOVIE_NO_OVERVIEW,
+    )
+
+
+# The texts are memoized by all the fields they are rendered from: the same movie is rendered once
+# however many Movie instances it has, and a change of any field (or another language of the data) gives a new entry
+@lru_cache(maxsize=4096)
+def _render_text(
+    movie_id: int,
+    title: str,
+    rating: float,
+    genres: str,
+    year: int,
+    overview: str,
+    trailer_url: str,
+) -> str:
+    """
+    Render the text of a movie (internal). See `Movie.text`
+    """
+
+    templates = _movie_templates()
+    return templates.text(
+        title=title,
+        rating=rating if rating != 0 else templates.no_rating,
+        genres=genres,
+        year=year,
+        trailer=templates.trailer(trailer_url=trailer_url) if trailer_url else "",
+        overview=templates.overview(overview=overview) if overview else templates.no_overview,
+    )
+
+
+@lru_cache(maxsize=4096)
+def _render_text_brief(movie_id: int, title: str, genres: str, overview: str) -> str:
+    """
+    Render the brief text of a movie (internal). See `Movie.text_brief`
+    """
+
+    templates = _movie_templates()
+    return templates.text_brief(
+        title=title,
+        genres=genres,
+        overview=templates.overview(overview=overview) if overview else templates.no_overview,
+    )
 
 class SpecialStateMachine(StatesGroup):
     """
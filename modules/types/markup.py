@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
@@ -5,9 +7,12 @@ from aiogram.types import (
     KeyboardButton,
 )
 
-from modules.types.common import MessageTemplates as template
-from modules.types.common import Movie
+from modules.types.common import templates
+from modules.types.common import Movie, MovieMeta
+
 
+# Maximum number of shared instances kept for each kind of per-movie markup
+CACHED_MARKUPS = 4096
 
 class MainMenuMarkup(ReplyKeyboardMarkup):
     """
@@ -19,39 +24,65 @@ class MainMenuMarkup(ReplyKeyboardMarkup):
     - Show trending movies
     - Clear favorites list
     - Help
+
+    The keyboard never changes, so use the shared instance from `cached()`
     """
 
     def __init__(self):
         super().__init__(
             keyboard=[
                 [
-                    KeyboardButton(text=template().BUTTON_SEARCH),
+                    KeyboardButton(text=templates.BUTTON_SEARCH),
                 ],
                 [
-                    KeyboardButton(text=template().BUTTON_FAVORITES_SHOW),
-                    KeyboardButton(text=template().BUTTON_TRENDING),
+                    KeyboardButton(text=templates.BUTTON_FAVORITES_SHOW),
+                    KeyboardButton(text=templates.BUTTON_TRENDING),
                 ],
                 [
-                    KeyboardButton(text=template().BUTTON_FAVORITES_CLEAR),
-                    KeyboardButton(text=template().BUTTON_HELP),
+                    KeyboardButton(text=templates.BUTTON_FAVORITES_CLEAR),
+                    KeyboardButton(text=templates.BUTTON_HELP),
                 ],
             ],
             resize_keyboard=True,
         )
 
+    @classmethod
+    @lru_cache(maxsize=1)
+    def cached(cls) -> "MainMenuMarkup":
+        """
+        The shared instance of the markup. It must not be modified
+        """
+
+        return cls()
+
+
+def _favorites_button(movie_id: int, favorites_action: str, callback_suffix: str = "") -> InlineKeyboardButton:
+    """
+    The "Add to favorites" or "Remove from favorites" button of a movie (internal)
+    """
+
+    if favorites_action == "add":
+        return InlineKeyboardButton(
+            text=templates.BUTTON_FAVORITES_ADD,
+            callback_data=f"favorites_add:{movie_id}{callback_suffix}",
+        )
+    elif favorites_action == "remove":
+        return InlineKeyboardButton(
+            text=templates.BUTTON_FAVORITES_REMOVE,
+            callback_data=f"favorites_remove:{movie_id}{callback_suffix}",
+        )
+
 
 class InfoInlineMarkup(InlineKeyboardMarkup):
     """
     Class representing an inline keyboard markup to display under a movie info
 
     Consists of a single button with either "Add to favorites" or "Remove from favorites"
+
+    The markup depends on its arguments only, so use the shared instances from `cached()`
     """
 
-    def __init__(
-        self,
-        movie_id: int,
-        favorites_action: str,
-    ):
+    def __init__(self, movie_id: int, favorites_action: str):
         """
         Parameters
         ----------
@@ -61,34 +92,35 @@ class InfoInlineMarkup(InlineKeyboardMarkup):
             Either "add" or "remove"
         """
 
-        if favorites_action == "add":
-            favorites_button = InlineKeyboardButton(
-                text=template().BUTTON_FAVORITES_ADD,
-                callback_data=f"favorites_add:{movie_id}",
-            )
-        elif favorites_action == "remove":
-            favorites_button = InlineKeyboardButton(
-                text=template().BUTTON_FAVORITES_REMOVE,
-                callback_data=f"favorites_remove:{movie_id}",
-            )
+        super().__init__(inline_keyboard=[[_favorites_button(movie_id, favorites_action)]])
+
+    @classmethod
+    @lru_cache(maxsize=CACHED_MARKUPS)
+    def cached(cls, movie_id: int, favorites_action: str) -> "InfoInlineMarkup":
+        """
+        The shared instance of the markup for the arguments (see `__init__`). It must not be modified
+        """
 
-        super().__init__(inline_keyboard=[[favorites_button]])
+        return cls(movie_id, favorites_action)
 
 
-class SearchResultInlineMarkup(InfoInlineMarkup):
+class SearchResultInlineMarkup(InlineKeyboardMarkup):
     """
     Class representing an inline keyboard markup to display under a movie info dervied from search
 
     Conists of 2 buttons:
     - Either "Add to favorites" or "Remove from favorites"
     - "Show more results"
+
+    The markup includes the token of the search results, which is unique to a search,
+    so it is built anew every time rather than shared
     """
 
     def __init__(
         self,
         movie_id: int,
         favorites_action: str = "add",
-        other_results_ids: list[int] = [],
+        results_token: str = "",
     ):
         """
         Parameters
@@ -97,50 +129,79 @@ class SearchResultInlineMarkup(InfoInlineMarkup):
             The ID of the movie.
         favorites_action : str
             Either "add" or "remove"
-        other_results_ids : list[int]
-            If used from search, list of unshown results (moviis IDs)  to show when corresponding button is pressed
+        results_token : str
+            The token of the stored search results (see `SearchResults`) to show when corresponding button is pressed
         """
 
-        super().__init__(movie_id, favorites_action)
-
-        ids = ",".join(map(str, other_results_ids))
-        # mark the buttons as from search
-        self.inline_keyboard[0][0].callback_data += "|search"
-
-        self.inline_keyboard.append(
-            [
-                InlineKeyboardButton(
-                    text=template().BUTTON_SHOW_MORE,
-                    callback_data="others:" + ids,
-                )
+        super().__init__(
+            inline_keyboard=[
+                # mark the button as from search, keeping the token to rebuild the markup
+                [_favorites_button(movie_id, favorites_action, f"|search:{results_token}")],
+                [
+                    InlineKeyboardButton(
+                        text=templates.BUTTON_SHOW_MORE,
+                        callback_data="others:" + results_token,
+                    )
+                ],
             ]
         )
 
 
 class FavoritesInlineMarkup(InlineKeyboardMarkup):
-    def __init__(self, movies: list[Movie]):
+    def __init__(
+        self, movies: list[Movie | MovieMeta], page: int = 0, pages: int = 1
+    ):
         """
-        Class representing the inline keyboard markup for displaying a list of favorite movies in form of buttons
+        Class representing the inline keyboard markup for displaying a page of favorite movies in form of buttons
 
-        Used as an answer to the `/favorites` command
+        Used as an answer to the `/favorites` command. If there is more than one page, a row of navigation buttons
+        is added: "Previous" and "Next" (`favorites_page:<page>` callbacks) around the page number
 
         Parameters
         ----------
-        movies : list[Movie]
-            A list of Movie objects
+        movies : list[Movie | MovieMeta]
+            A list of Movie objects or their metadata on the page
+        page : int
+            The number of the page, starting from 0. Default is 0.
+        pages : int
+            The total number of pages. Default is 1.
         """
 
-        super().__init__(
-            inline_keyboard=[
-                [
+        keyboard = [
+            [
+                InlineKeyboardButton(
+                    text=movie.title,
+                    callback_data=f"expand_favorites:{movie.movie_id}",
+                )
+            ]
+            for movie in movies
+        ]
+
+        if pages > 1:
+            navigation = []
+            if page > 0:
+                navigation.append(
                     InlineKeyboardButton(
-                        text=movie.title,
-                        callback_data=f"expand_favorites:{movie.movie_id}",
+                        text=templates.BUTTON_FAVORITES_PREV,
+                        callback_data=f"favorites_page:{page - 1}",
                     )
-                ]
-                for movie in movies
-            ]
-        )
+                )
+            navigation.append(
+                InlineKeyboardButton(
+                    text=f"{page + 1}/{pages}",
+                    callback_data="favorites_page:current",
+                )
+            )
+            if page < pages - 1:
+                navigation.append(
+                    InlineKeyboardButton(
+                        text=templates.BUTTON_FAVORITES_NEXT,
+                        callback_data=f"favorites_page:{page + 1}",
+                    )
+                )
+            keyboard.append(navigation)
+
+        super().__init__(inline_keyboard=keyboard)
 
 
 class TrendingInlineMarkup(InlineKeyboardMarkup):
@@ -182,15 +243,26 @@ class ClearConfirmMarkup(ReplyKeyboardMarkup):
     Consists of a 2 buttons:
     - Approve
     - Disapprove
+
+    The keyboard never changes, so use the shared instance from `cached()`
     """
 
     def __init__(self):
         super().__init__(
             keyboard=[
                 [
-                    KeyboardButton(text=template().BUTTON_CLEAR_CONFIRM),
-                    KeyboardButton(text=template().BUTTON_CLEAR_CANCEL),
+                    KeyboardButton(text=templates.BUTTON_CLEAR_CONFIRM),
+                    KeyboardButton(text=templates.BUTTON_CLEAR_CANCEL),
                 ],
             ],
             resize_keyboard=True,
         )
+
+    @classmethod
+    @lru_cache(maxsize=1)
+    def cached(cls) -> "ClearConfirmMarkup":
+        """
+        The shared instance of the markup. It must not be modified
+        """
+
+        return cls()
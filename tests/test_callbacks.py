@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageReplyMarkup
+
+from modules.handlers import callbacks
+
+
+def test_turning_to_the_shown_favorites_page_still_answers(monkeypatch):
+    async def favorites_page(user_id, page, movie_api, db):
+        return "markup"
+
+    async def edit_reply_markup(reply_markup):
+        raise TelegramBadRequest(
+            EditMessageReplyMarkup(),
+            "Bad Request: message is not modified: specified new message content and reply markup are exactly the same",
+        )
+
+    answered = []
+
+    async def answer(*args, **kwargs):
+        answered.append(True)
+
+    monkeypatch.setattr(callbacks, "_favorites_page", favorites_page)
+    callback = SimpleNamespace(
+        data="favorites_page:2",
+        from_user=SimpleNamespace(id=1),
+        message=SimpleNamespace(edit_reply_markup=edit_reply_markup),
+        answer=answer,
+    )
+
+    asyncio.run(callbacks.turn_favorites_page(callback, movie_api=None, db=None))
+
+    assert answered == [True]
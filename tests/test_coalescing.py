@@ -0,0 +1,73 @@
+import asyncio
+
+from modules.services.coalescing import SingleFlight
+
+
+def test_waiters_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+        return calls, results, len(flight)
+
+    calls, results, in_flight = asyncio.run(scenario())
+    assert calls == 1
+    assert results == [1] * 5
+    assert in_flight == 0
+
+
+def test_caller_after_last_waiter_cancelled_starts_new_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                # slow cleanup, like releasing an HTTP response
+                await asyncio.sleep(0.01)
+                raise
+            return "fresh"
+
+        first = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        # arrives while the cancelled call is still cleaning up
+        second = asyncio.create_task(flight.do("key", load))
+
+        result = await second
+        return first.cancelled(), second.cancelled(), result, calls
+
+    first_cancelled, second_cancelled, result, calls = asyncio.run(scenario())
+    assert first_cancelled
+    assert not second_cancelled
+    assert result == "fresh"
+    assert calls == 2
+
+
+def test_call_survives_while_a_waiter_is_left():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", load))
+        second = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
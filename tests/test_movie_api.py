@@ -0,0 +1,19 @@
+import asyncio
+
+from modules.services.movieAPI import MovieAPI
+
+
+def test_gather_degrades_failed_and_cancelled_items():
+    async def scenario():
+        async def ok():
+            return "ok"
+
+        async def failing():
+            raise RuntimeError("TMDB is down")
+
+        cancelled = asyncio.get_running_loop().create_future()
+        cancelled.cancel()
+
+        return await MovieAPI._gather([ok(), failing(), cancelled])
+
+    assert asyncio.run(scenario()) == ["ok", None, None]
@@ -0,0 +1,75 @@
+import asyncio
+import queue
+
+from aiogram import Bot
+
+from modules.services.workers import UpdateWorker
+
+
+def message_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "-"},
+            "text": "-",
+        },
+    }
+
+
+class BlockingDispatcher:
+    """
+    Stands in for the dispatcher: updates of the blocked user wait until released
+    """
+
+    def __init__(self, blocked_user: int):
+        self.blocked_user = blocked_user
+        self.release = asyncio.Event()
+        self.handled: list[int] = []
+        self.running = 0
+        self.max_running = 0
+
+    async def feed_update(self, bot, update):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if update.message.from_user.id == self.blocked_user:
+                await self.release.wait()
+            self.handled.append(update.update_id)
+        finally:
+            self.running -= 1
+
+
+def test_busy_user_does_not_hold_up_others():
+    async def scenario():
+        bot = Bot("42:TEST")
+        dp = BlockingDispatcher(blocked_user=1)
+        updates = queue.Queue()
+        worker = UpdateWorker(dp, bot, updates, concurrency=2)
+
+        # user 1 sends more updates than there are slots, then user 2 sends one
+        for update_id in range(1, 6):
+            updates.put((1, message_update(update_id, 1)))
+        updates.put((2, message_update(6, 2)))
+
+        run = asyncio.create_task(worker.run())
+        for _ in range(100):
+            if 6 in dp.handled:
+                break
+            await asyncio.sleep(0.01)
+        handled_while_blocked = list(dp.handled)
+
+        dp.release.set()
+        updates.put(None)
+        await run
+        await bot.session.close()
+
+        return handled_while_blocked, dp.handled, dp.max_running
+
+    handled_while_blocked, handled, max_running = asyncio.run(scenario())
+    assert handled_while_blocked == [6]
+    # updates of one user are handled one by one, in order
+    assert handled == [6, 1, 2, 3, 4, 5]
+    assert max_running == 2